@@ -0,0 +1,102 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(QUERY_BUDGET_CHECK=True)
+class ApiTests(TestCase):
+    """Read-only JSON API: курсоры, выбор полей и ETag."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='api_author', first_name='Лев')
+        cls.group = Group.objects.create(
+            title='Классика', slug='classic', description='Описание')
+        cls.posts = [
+            Post.objects.create(text=f'Пост {i}', author=cls.author,
+                                group=cls.group if i % 2 else None)
+            for i in range(5)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.author, text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get(self, name, params=None, **kwargs):
+        response = self.client.get(reverse(f'api:{name}', kwargs=kwargs),
+                                   params or {})
+        return response, response.json()
+
+    def test_post_list_cursor_pagination(self):
+        response, data = self.get('post_list', {'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post['id'] for post in data['results']],
+                         [self.posts[4].pk, self.posts[3].pk])
+        self.assertIsNone(data['previous'])
+        seen = [post['id'] for post in data['results']]
+        while data['next']:
+            data = self.client.get(data['next']).json()
+            seen += [post['id'] for post in data['results']]
+        self.assertEqual(seen, [post.pk for post in reversed(self.posts)])
+        data = self.client.get(data['previous']).json()
+        self.assertEqual([post['id'] for post in data['results']],
+                         [self.posts[2].pk, self.posts[1].pk])
+
+    def test_sparse_fields_select_only_requested_columns(self):
+        with self.assertNumQueries(1) as queries:
+            _, data = self.get('post_list', {'fields': 'id,text'})
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+        sql = queries.captured_queries[0]['sql']
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('"image"', sql)
+        response, data = self.get('post_list', {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', data['detail'])
+
+    def test_filters_and_details(self):
+        _, data = self.get('post_list', {'group': 'classic',
+                                         'fields': 'id,group,author'})
+        self.assertEqual(data['results'], [
+            {'id': post.pk, 'group': 'classic', 'author': 'api_author'}
+            for post in (self.posts[3], self.posts[1])
+        ])
+        _, data = self.get('post_detail', post_id=self.posts[0].pk)
+        self.assertEqual(data['comments_count'], 1)
+        self.assertIsNone(data['image'])
+        _, data = self.get('comment_list', post_id=self.posts[0].pk)
+        self.assertEqual(data['results'][0]['text'], 'Комментарий')
+        _, data = self.get('group_detail', slug='classic')
+        self.assertEqual(data['title'], 'Классика')
+        _, data = self.get('group_list', {'fields': 'slug'})
+        self.assertEqual(data, {'results': [{'slug': 'classic'}],
+                                'next': None})
+        _, data = self.get('user_detail', username='api_author')
+        self.assertEqual(data['posts_count'], 5)
+        response, _ = self.get('post_detail', post_id=0)
+        self.assertEqual(response.status_code, 404)
+
+    def test_etag_revalidation(self):
+        url = reverse('api:post_detail', kwargs={'post_id': self.posts[0].pk})
+        response = self.client.get(url)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Comment.objects.create(
+            post=self.posts[0], author=self.author, text='Ещё')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['comments_count'], 2)
+
+    def test_read_only(self):
+        response = self.client.post(reverse('api:post_list'))
+        self.assertEqual(response.status_code, 405)
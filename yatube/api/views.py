@@ -0,0 +1,232 @@
+import datetime
+from functools import wraps
+
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
+
+from core.decorators import query_budget, versioned_cache
+from posts.cache_versions import (get_validator, group_validator,
+                                  post_validator, profile_validator)
+from posts.models import Comment, Group, Post, User
+from posts.paginator import POST_COUNT, CursorPaginator
+
+MAX_LIMIT = 100
+
+# Поле ответа -> путь для values_list: в SELECT попадают только
+# запрошенные колонки, а JOIN — только если нужен связанный объект.
+POST_FIELDS = {
+    'id': 'pk',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+COMMENT_FIELDS = {
+    'id': 'pk',
+    'post': 'post_id',
+    'text': 'text',
+    'author': 'author__username',
+    'created': 'created',
+}
+GROUP_FIELDS = {
+    'id': 'pk',
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+}
+USER_FIELDS = {
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'posts_count': 'stats__posts_count',
+    'followers_count': 'stats__followers_count',
+    'following_count': 'stats__following_count',
+}
+
+
+class ApiError(Exception):
+    def __init__(self, detail, status=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+def api_view(view):
+    """Только GET и HEAD; ApiError превращается в JSON с detail."""
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as error:
+            return json_response({'detail': error.detail}, error.status)
+    return wrapper
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def get_fields(request, available):
+    """Поля из ?fields=a,b; по умолчанию все."""
+    value = request.GET.get('fields')
+    if not value:
+        return list(available)
+    fields = value.split(',')
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise ApiError(f'Неизвестные поля: {", ".join(unknown)}')
+    return fields
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get('limit', POST_COUNT))
+    except ValueError:
+        raise ApiError('limit должен быть числом')
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def project(queryset, available, fields, *keys):
+    """values_list с нужными колонками и ключами пагинации."""
+    paths = [available[field] for field in fields]
+    paths += [key for key in keys if key not in paths]
+    return queryset.values_list(*paths, named=True)
+
+
+def serialize(row, available, fields):
+    data = {}
+    for field in fields:
+        value = getattr(row, available[field])
+        if isinstance(value, datetime.datetime):
+            value = value.isoformat()
+        elif field == 'image':
+            value = Post.image.field.storage.url(value) if value else None
+        data[field] = value
+    return data
+
+
+def page_url(request, **params):
+    query = request.GET.copy()
+    for name in ('after', 'before'):
+        query.pop(name, None)
+    query.update(params)
+    return f'{request.path}?{query.urlencode()}'
+
+
+def cursor_page(request, queryset, available, date_field):
+    """Страница по курсору (date_field, pk) от новых к старым."""
+    fields = get_fields(request, available)
+    rows = project(queryset, available, fields, date_field, 'pk')
+    page = CursorPaginator(rows, get_limit(request), date_field, 'pk')
+    page = page.get_page(after=request.GET.get('after'),
+                         before=request.GET.get('before'))
+    return json_response({
+        'results': [serialize(row, available, fields) for row in page],
+        'next': (page_url(request, after=page.next_cursor)
+                 if page.has_next() else None),
+        'previous': (page_url(request, before=page.previous_cursor)
+                     if page.has_previous() else None),
+    })
+
+
+def detail(request, queryset, available):
+    fields = get_fields(request, available)
+    row = project(queryset, available, fields).first()
+    if row is None:
+        raise ApiError('Не найдено', 404)
+    return json_response(serialize(row, available, fields))
+
+
+def post_list_validator(request):
+    scopes = []
+    group = request.GET.get('group')
+    if group:
+        group_id = Group.objects.filter(slug=group).values_list(
+            'pk', flat=True).first()
+        if group_id is None:
+            return None
+        scopes.append(f'group:{group_id}')
+    author = request.GET.get('author')
+    if author:
+        user_id = User.objects.filter(username=author).values_list(
+            'pk', flat=True).first()
+        if user_id is None:
+            return None
+        scopes.append(f'profile:{user_id}')
+    return get_validator(*(scopes or ['index']))
+
+
+def group_list_validator(request):
+    return get_validator('index')
+
+
+@api_view
+@versioned_cache(post_list_validator)
+@query_budget(1)
+def post_list(request):
+    """Посты от новых к старым; фильтры ?group=slug и ?author=username."""
+    posts = Post.objects.all()
+    if request.GET.get('group'):
+        posts = posts.filter(group__slug=request.GET['group'])
+    if request.GET.get('author'):
+        posts = posts.filter(author__username=request.GET['author'])
+    return cursor_page(request, posts, POST_FIELDS, 'pub_date')
+
+
+@api_view
+@versioned_cache(post_validator)
+@query_budget(1)
+def post_detail(request, post_id):
+    return detail(request, Post.objects.filter(pk=post_id), POST_FIELDS)
+
+
+@api_view
+@versioned_cache(post_validator)
+@query_budget(2)
+def comment_list(request, post_id):
+    """Комментарии поста от новых к старым."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise ApiError('Не найдено', 404)
+    comments = Comment.objects.filter(post_id=post_id)
+    return cursor_page(request, comments, COMMENT_FIELDS, 'created')
+
+
+@api_view
+@versioned_cache(group_list_validator)
+@query_budget(1)
+def group_list(request):
+    """Группы по id; следующая страница — ?after=<последний id>."""
+    fields = get_fields(request, GROUP_FIELDS)
+    limit = get_limit(request)
+    groups = Group.objects.order_by('pk')
+    after = request.GET.get('after')
+    if after:
+        if not after.isdigit():
+            raise ApiError('after должен быть числом')
+        groups = groups.filter(pk__gt=after)
+    rows = list(project(groups, GROUP_FIELDS, fields, 'pk')[:limit + 1])
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    return json_response({
+        'results': [serialize(row, GROUP_FIELDS, fields) for row in rows],
+        'next': page_url(request, after=rows[-1].pk) if has_next else None,
+    })
+
+
+@api_view
+@versioned_cache(group_validator)
+@query_budget(1)
+def group_detail(request, slug):
+    return detail(request, Group.objects.filter(slug=slug), GROUP_FIELDS)
+
+
+@api_view
+@versioned_cache(profile_validator)
+@query_budget(1)
+def user_detail(request, username):
+    return detail(
+        request, User.objects.filter(username=username), USER_FIELDS)
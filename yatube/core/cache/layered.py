@@ -0,0 +1,242 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+LOG_KEY = 'layered_cache:log'
+
+
+class L1State:
+    """L1 одного процесса: общий для всех потоков, как у LocMemCache."""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # Последняя прочитанная запись журнала и номера своих записей.
+        self.seen = None
+        self.own = set()
+        self.checked = 0
+        self.stats = Counter()
+
+
+# caches создаёт экземпляр бэкенда на каждый поток, поэтому L1 живёт
+# на уровне модуля, по одному на LOCATION.
+_states = {}
+_states_lock = threading.Lock()
+
+
+class LayeredCache(BaseCache):
+    """Небольшой LRU в памяти процесса (L1) перед любым кэшем Django (L2).
+
+    LOCATION — алиас L2 в CACHES. Перезапись и удаление ключей
+    попадают в журнал в L2 (номер записи — счётчик LOG_KEY). Процессы
+    читают журнал не чаще раза в MAX_STALENESS секунд и убирают из
+    своего L1 только перечисленные там ключи; если журнал отстал
+    больше чем на LOG_MAX_GAP записей или его записи истекли
+    (LOG_TIMEOUT), L1 сбрасывается целиком. Так устаревание L1
+    ограничено MAX_STALENESS::
+
+        CACHES = {
+            'default': {
+                'BACKEND': 'core.cache.layered.LayeredCache',
+                'LOCATION': 'shared',
+                'OPTIONS': {'L1_MAX_ENTRIES': 500, 'MAX_STALENESS': 1},
+            },
+            'shared': {
+                'BACKEND': 'core.cache.sqlite.SQLiteCache',
+                'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+            },
+        }
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._alias = location
+        self._l1_max_entries = options.get('L1_MAX_ENTRIES', 500)
+        self._l1_timeout = options.get('L1_TIMEOUT', 60)
+        self._max_staleness = options.get('MAX_STALENESS', 1)
+        self._log_timeout = options.get('LOG_TIMEOUT', 300)
+        self._log_max_gap = options.get('LOG_MAX_GAP', 1000)
+        with _states_lock:
+            self._state = _states.setdefault(location, L1State())
+
+    @property
+    def _l1(self):
+        return self._state.entries
+
+    @property
+    def _lock(self):
+        return self._state.lock
+
+    @property
+    def stats(self):
+        return self._state.stats
+
+    @property
+    def l2(self):
+        return caches[self._alias]
+
+    def _key(self, key, version):
+        return self.l2.make_key(key, version=version)
+
+    def _sync(self):
+        state = self._state
+        now = time.monotonic()
+        if now - state.checked < self._max_staleness:
+            return
+        state.checked = now
+        seq = self.l2.get(LOG_KEY, 0)
+        if seq == state.seen:
+            return
+        with self._lock:
+            own, state.own = state.own, set()
+        if (state.seen is None or seq < state.seen
+                or seq - state.seen > self._log_max_gap):
+            self._l1_clear()
+        else:
+            numbers = [number for number in range(state.seen + 1, seq + 1)
+                       if number not in own]
+            entries = self.l2.get_many(
+                [f'{LOG_KEY}:{number}' for number in numbers])
+            if len(entries) < len(numbers):
+                # Запись истекла или ещё не дописана: ключей не узнать.
+                self._l1_clear()
+            else:
+                self._l1_delete(
+                    [key for keys in entries.values() for key in keys])
+        with self._lock:
+            state.own.update(number for number in own if number > seq)
+        state.seen = seq
+
+    def _log(self, keys):
+        """Записывает в журнал ключи, которые надо убрать из чужих L1."""
+        try:
+            seq = self.l2.incr(LOG_KEY)
+        except ValueError:
+            self.l2.add(LOG_KEY, 0, None)
+            seq = self.l2.incr(LOG_KEY)
+        self.l2.set(f'{LOG_KEY}:{seq}', keys, self._log_timeout)
+        with self._lock:
+            self._state.own.add(seq)
+
+    def _l1_get(self, key):
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return False, None
+            value, expires = entry
+            if expires is not None and expires <= time.time():
+                del self._l1[key]
+                return False, None
+            self._l1.move_to_end(key)
+            return True, value
+
+    def _l1_set(self, key, value, expires):
+        with self._lock:
+            self._l1[key] = (value, expires)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self._l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_clear(self):
+        with self._lock:
+            self._l1.clear()
+
+    def _l1_delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._l1.pop(key, None)
+
+    def _l1_expires(self, timeout=DEFAULT_TIMEOUT):
+        if timeout is DEFAULT_TIMEOUT:
+            return time.time() + self._l1_timeout
+        expires = self.get_backend_timeout(timeout)
+        return min(expires or float('inf'), time.time() + self._l1_timeout)
+
+    def get(self, key, default=None, version=None):
+        missing = object()
+        value = self.get_many([key], version=version).get(key, missing)
+        return default if value is missing else value
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found, remote = {}, []
+        for key in keys:
+            hit, value = self._l1_get(self._key(key, version))
+            self.stats['l1_hits' if hit else 'l1_misses'] += 1
+            if hit:
+                found[key] = value
+            else:
+                remote.append(key)
+        if remote:
+            fetched = self.l2.get_many(remote, version=version)
+            self.stats['l2_hits'] += len(fetched)
+            self.stats['l2_misses'] += len(remote) - len(fetched)
+            expires = self._l1_expires()
+            for key, value in fetched.items():
+                self._l1_set(self._key(key, version), value, expires)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        # Сначала догоняем журнал, чтобы не принять свои записи за чужие.
+        self._sync()
+        failed = self.l2.set_many(data, timeout, version)
+        self._log([self._key(key, version) for key in data])
+        expires = self._l1_expires(timeout)
+        for key, value in data.items():
+            if key not in failed:
+                self._l1_set(self._key(key, version), value, expires)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # Новый ключ не может лежать в чужом L1, журнал не нужен.
+        self._sync()
+        added = self.l2.add(key, value, timeout, version)
+        if added:
+            self._l1_set(self._key(key, version), value,
+                         self._l1_expires(timeout))
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        value = self.l2.incr(key, delta, version)
+        made_key = self._key(key, version)
+        self._log([made_key])
+        with self._lock:
+            # Срок жизни берём из L1: он не дольше, чем у ключа в L2.
+            entry = self._l1.get(made_key)
+            if entry is not None:
+                self._l1[made_key] = (value, entry[1])
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        touched = self.l2.touch(key, timeout, version)
+        self._l1_delete([self._key(key, version)])
+        return touched
+
+    def has_key(self, key, version=None):
+        hit, _ = self._l1_get(self._key(key, version))
+        return hit or self.l2.has_key(key, version)
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        self.l2.delete_many(keys, version)
+        self._log([self._key(key, version) for key in keys])
+        self._l1_delete([self._key(key, version) for key in keys])
+
+    def clear(self):
+        self.l2.clear()
+        self._l1_clear()
+        self._state.seen = None
+        self._state.checked = 0
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
@@ -0,0 +1,227 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL'
+    ')',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite (WAL), общий для всех процессов на хосте.
+
+    Не требует отдельного сервера. Вытеснение идёт по времени последнего
+    чтения (LRU с точностью до LRU_RESOLUTION секунд), целые числа хранятся
+    как INTEGER, поэтому incr() атомарен и между процессами::
+
+        CACHES = {
+            'default': {
+                'BACKEND': 'core.cache.sqlite.SQLiteCache',
+                'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+                'OPTIONS': {'MAX_ENTRIES': 10000},
+            }
+        }
+
+    Число строк считается полным проходом по таблице под блокировкой
+    писателя, поэтому вытеснение проверяется не на каждой записи, а раз
+    в CULL_INTERVAL записанных строк каждого соединения. Кэш может
+    ненадолго превысить MAX_ENTRIES на столько строк.
+    """
+    LRU_RESOLUTION = 1.0
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._location = location
+        self._local = threading.local()
+        self._cull_interval = params.get('OPTIONS', {}).get(
+            'CULL_INTERVAL', 100)
+
+    @property
+    def _db(self):
+        # Соединения нельзя переносить через fork и между потоками.
+        if getattr(self._local, 'pid', None) != os.getpid():
+            db = sqlite3.connect(
+                self._location, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                db.execute(statement)
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return self._local.db
+
+    def _write(self):
+        return _Transaction(self._db)
+
+    @staticmethod
+    def _encode(value):
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _touch(self, rows, now):
+        stale = [key for key, accessed in rows
+                 if now - accessed > self.LRU_RESOLUTION]
+        if stale:
+            with self._write() as db:
+                db.executemany(
+                    'UPDATE cache SET accessed = ? WHERE key = ?',
+                    [(now, key) for key in stale])
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        now = time.time()
+        rows = self._db.execute(
+            'SELECT key, value, accessed FROM cache '
+            'WHERE key IN (%s) AND (expires IS NULL OR expires > ?)'
+            % ', '.join('?' * len(keys)),
+            [*keys, now],
+        ).fetchall()
+        self._touch([(key, accessed) for key, _, accessed in rows], now)
+        return {keys[key]: self._decode(value) for key, value, _ in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        rows = [(self._key(key, version), self._encode(value), expires, now)
+                for key, value in data.items()]
+        with self._write() as db:
+            db.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed)'
+                ' VALUES (?, ?, ?, ?)', rows)
+            self._maybe_cull(db, now, len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as db:
+            db.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, now))
+            added = db.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires, accessed)'
+                ' VALUES (?, ?, ?, ?)',
+                (key, self._encode(value), self.get_backend_timeout(timeout),
+                 now),
+            ).rowcount == 1
+            if added:
+                self._maybe_cull(db, now, 1)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._write() as db:
+            row = db.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = self._decode(row[0]) + delta
+            db.execute('UPDATE cache SET value = ? WHERE key = ?',
+                       (self._encode(value), key))
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as db:
+            return db.execute(
+                'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), now, key, now),
+            ).rowcount == 1
+
+    def has_key(self, key, version=None):
+        return self._db.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._key(key, version), time.time()),
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            with self._write() as db:
+                db.execute('DELETE FROM cache WHERE key IN (%s)'
+                           % ', '.join('?' * len(keys)), keys)
+
+    def clear(self):
+        with self._write() as db:
+            db.execute('DELETE FROM cache')
+
+    def _maybe_cull(self, db, now, written):
+        writes = getattr(self._local, 'writes', 0) + written
+        if writes < self._cull_interval:
+            self._local.writes = writes
+            return
+        self._local.writes = 0
+        self._cull(db, now)
+
+    def _cull(self, db, now):
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        db.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        evict = max(count // self._cull_frequency if self._cull_frequency
+                    else count, count - self._max_entries)
+        db.execute(
+            'DELETE FROM cache WHERE key IN '
+            '(SELECT key FROM cache ORDER BY accessed LIMIT ?)', (evict,))
+
+    def close(self, **kwargs):
+        # Соединение живёт весь поток: переоткрывать файл на каждый
+        # запрос дороже, чем держать его открытым.
+        pass
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT: запись под блокировкой писателя."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        return self.db
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core import checks
+
+# Бэкенды, у которых в каждом процессе свои данные.
+PER_PROCESS_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+LAYERED_BACKEND = 'core.cache.layered.LayeredCache'
+CACHED_SESSION_ENGINES = (
+    'django.contrib.sessions.backends.cache',
+    'django.contrib.sessions.backends.cached_db',
+)
+
+
+def is_shared_cache(alias):
+    """Видят ли все процессы одни и те же данные в кэше alias."""
+    config = settings.CACHES.get(alias, {})
+    backend = config.get('BACKEND')
+    if backend == LAYERED_BACKEND:
+        # L1 сверяется с L2 сам, поэтому решает L2.
+        return is_shared_cache(config.get('LOCATION'))
+    return backend is not None and backend not in PER_PROCESS_BACKENDS
+
+
+@checks.register(checks.Tags.caches, checks.Tags.security)
+def check_shared_caches(app_configs, **kwargs):
+    """Сессии в кэше и лимиты частоты требуют общего для процессов кэша."""
+    errors = []
+    session_cache = getattr(settings, 'SESSION_CACHE_ALIAS', 'default')
+    if (settings.SESSION_ENGINE in CACHED_SESSION_ENGINES
+            and not is_shared_cache(session_cache)):
+        errors.append(checks.Error(
+            f'Сессии в кэше {session_cache!r}, а он свой в каждом '
+            f'процессе: вышедший пользователь останется залогинен '
+            f'в других воркерах.',
+            hint='Укажите общий кэш (например, core.cache.sqlite.'
+                 'SQLiteCache) или SESSION_ENGINE '
+                 "'django.contrib.sessions.backends.db'.",
+            id='core.E001',
+        ))
+    rate_limit_cache = getattr(settings, 'RATE_LIMIT_CACHE', 'default')
+    if (getattr(settings, 'RATE_LIMITS', None)
+            and not is_shared_cache(rate_limit_cache)):
+        errors.append(checks.Error(
+            f'Счётчики RATE_LIMITS в кэше {rate_limit_cache!r}, а он свой '
+            f'в каждом процессе: лимиты умножаются на число воркеров.',
+            hint='Укажите в RATE_LIMIT_CACHE общий кэш.',
+            id='core.E002',
+        ))
+    return errors
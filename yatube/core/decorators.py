@@ -0,0 +1,121 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+
+def query_budget(max_queries):
+    """Падает, если view сделала больше max_queries запросов к БД.
+
+    Проверка включается настройкой QUERY_BUDGET_CHECK, поэтому
+    в тестах её можно включить через override_settings.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not getattr(settings, 'QUERY_BUDGET_CHECK', False):
+                return view(request, *args, **kwargs)
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                response = view(request, *args, **kwargs)
+            if len(counter.queries) > max_queries:
+                raise QueryBudgetExceeded(
+                    f'{view.__name__}: {len(counter.queries)} запросов '
+                    f'при бюджете {max_queries}:\n'
+                    + '\n'.join(counter.queries)
+                )
+            return response
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
+
+
+def anonymous_page_cache(validator):
+    """Кэш целых страниц для анонимов с ответами 304.
+
+    validator(request, *args, **kwargs) дёшево возвращает (tag,
+    last_modified) или None, если страницу надо просто отрендерить.
+    Пока tag не изменился, страница отдаётся из кэша или ответом 304
+    без рендеринга. Авторизованные пользователи видят кнопки подписки
+    и редактирования, поэтому идут мимо кэша.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                return view(request, *args, **kwargs)
+            response = versioned_response(
+                'anonymous_page', validator, view, request, args, kwargs)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
+
+
+def versioned_cache(validator):
+    """То же, что anonymous_page_cache, для ответов без персонализации.
+
+    Ответ одинаков для всех, поэтому кэш и 304 работают и для
+    авторизованных запросов, а Vary: Cookie не нужен.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            return versioned_response(
+                'versioned_page', validator, view, request, args, kwargs)
+        return wrapper
+    return decorator
+
+
+def versioned_response(prefix, validator, view, request, args, kwargs):
+    validated = validator(request, *args, **kwargs)
+    if validated is None:
+        return view(request, *args, **kwargs)
+    tag, last_modified = validated
+    digest = hashlib.md5(
+        f'{request.get_full_path()}|{tag}'.encode()).hexdigest()
+    etag = quote_etag(digest)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = cached_page(
+            f'{prefix}:{digest}', lambda: view(request, *args, **kwargs))
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+def cached_page(key, render):
+    cached = cache.get(key)
+    if cached is not None:
+        content, content_type = cached
+        return HttpResponse(content, content_type=content_type)
+    response = render()
+    if response.status_code == 200 and not response.streaming:
+        cache.set(key, (response.content, response['Content-Type']),
+                  settings.ANONYMOUS_PAGE_CACHE_TIMEOUT)
+    return response
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache.sqlite import SQLiteCache
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает SQLiteCache с LocMemCache и FileBasedCache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keys', type=int, default=2000)
+        parser.add_argument('--size', type=int, default=2048,
+                            help='Размер значения в байтах')
+
+    def handle(self, *args, **options):
+        params = {'OPTIONS': {'MAX_ENTRIES': options['keys'] * 2}}
+        with tempfile.TemporaryDirectory() as directory:
+            backends = {
+                'locmem': LocMemCache('benchmark', params),
+                'filebased': FileBasedCache(
+                    os.path.join(directory, 'files'), params),
+                'sqlite': SQLiteCache(
+                    os.path.join(directory, 'cache.sqlite3'), params),
+            }
+            for name, backend in backends.items():
+                self.report(name, self.run(backend, options))
+
+    def run(self, backend, options):
+        keys = [f'key:{i}' for i in range(options['keys'])]
+        value = 'x' * options['size']
+        pages = [keys[i:i + 10] for i in range(0, len(keys), 10)]
+        results = {}
+
+        started = time.perf_counter()
+        for key in keys:
+            backend.set(key, value)
+        results['set'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for key in keys:
+            backend.get(key)
+        results['get'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for page in pages:
+            backend.get_many(page)
+        results['get_many(10)'] = time.perf_counter() - started
+
+        backend.set('counter', 0)
+        started = time.perf_counter()
+        for _ in keys:
+            backend.incr('counter')
+        results['incr'] = time.perf_counter() - started
+        return {op: len(keys) / elapsed for op, elapsed in results.items()}
+
+    def report(self, name, results):
+        line = ', '.join(f'{op} {rate:,.0f}/с' for op, rate in results.items())
+        self.stdout.write(f'{name}: {line} (ключей в секунду)')
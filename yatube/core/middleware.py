@@ -0,0 +1,111 @@
+import math
+import time
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import caches
+from django.http import HttpResponse
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60)."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+class SlidingWindow:
+    """Счётчик запросов в скользящем окне на атомарном cache.incr.
+
+    Хранятся только счётчики текущего и предыдущего окна; число
+    запросов за последние period секунд оценивается как текущий
+    счётчик плюс доля предыдущего, ещё попадающая в окно.
+    """
+
+    def __init__(self, cache, limit, period):
+        self.cache = cache
+        self.limit = limit
+        self.period = period
+
+    def hit(self, key, now=None):
+        """Учитывает запрос; 0 — пропустить, иначе секунды до повтора."""
+        now = time.time() if now is None else now
+        window, elapsed = divmod(now, self.period)
+        current = f'{key}:{int(window)}'
+        # Окно живёт два периода: следующее окно читает его как прошлое.
+        self.cache.add(current, 0, self.period * 2)
+        try:
+            count = self.cache.incr(current)
+        except ValueError:
+            # Ключ вытеснили между add и incr.
+            self.cache.set(current, 1, self.period * 2)
+            count = 1
+        previous = self.cache.get(f'{key}:{int(window) - 1}', 0)
+        weight = 1 - elapsed / self.period
+        if previous * weight + count <= self.limit:
+            return 0
+        return max(math.ceil(self.period - elapsed), 1)
+
+
+class RateLimitMiddleware:
+    """Ограничивает частоту запросов к view по имени URL.
+
+    Лимиты берутся из settings.RATE_LIMITS::
+
+        RATE_LIMITS = {
+            'posts:add_comment': {'user': '20/m', 'ip': '60/m'},
+            'users:signup': {'ip': '5/h'},
+        }
+
+    'user' считается по id из сессии, 'ip' — по REMOTE_ADDR; в
+    'methods' можно перечислить ограничиваемые методы (по умолчанию
+    только POST). Проверка не обращается к БД: пользователь не
+    загружается, а сессия в cached_db читается из кэша. Отказ —
+    короткий ответ 429 с Retry-After без шаблонов.
+
+    RATE_LIMIT_CACHE и кэш сессий должны быть общими для всех
+    процессов, иначе лимиты умножаются на число воркеров, а выход
+    из аккаунта не виден другим; это проверяет core.E001/E002.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.cache = caches[getattr(settings, 'RATE_LIMIT_CACHE', 'default')]
+        self.rules = {}
+        for name, rule in getattr(settings, 'RATE_LIMITS', {}).items():
+            methods = rule.get('methods', ('POST',))
+            windows = [(scope, SlidingWindow(self.cache, *parse_rate(rate)))
+                       for scope, rate in rule.items() if scope != 'methods']
+            self.rules[name] = methods, windows
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view, args, kwargs):
+        rule = self.rules.get(request.resolver_match.view_name)
+        if rule is None:
+            return None
+        methods, windows = rule
+        if request.method not in methods:
+            return None
+        for scope, window in windows:
+            ident = self.identify(request, scope)
+            if ident is None:
+                continue
+            retry_after = window.hit(
+                f'ratelimit:{request.resolver_match.view_name}:{scope}:'
+                f'{ident}')
+            if retry_after:
+                response = HttpResponse(
+                    'Слишком много запросов, попробуйте позже.',
+                    status=429, content_type='text/plain; charset=utf-8')
+                response['Retry-After'] = str(retry_after)
+                return response
+        return None
+
+    @staticmethod
+    def identify(request, scope):
+        if scope == 'ip':
+            return request.META.get('REMOTE_ADDR')
+        return request.session.get(SESSION_KEY)
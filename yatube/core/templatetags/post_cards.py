@@ -0,0 +1,49 @@
+from django import template
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts.thumbnails import attach_thumbnails
+
+register = template.Library()
+
+CARD_TIMEOUT = 60 * 60 * 24
+
+
+def card_key(post):
+    return make_template_fragment_key('post_card', [
+        post.pk,
+        post.revision,
+        post.comments_count,
+        post.author.get_full_name(),
+    ])
+
+
+@register.simple_tag
+def prefetch_post_cards(posts):
+    """Достаёт из кэша карточки всех постов страницы одним get_many.
+
+    Для карточек, которые придётся рендерить, заранее пачкой
+    получает адреса миниатюр.
+    """
+    keys = {post.pk: card_key(post) for post in posts}
+    cached = cache.get_many(keys.values())
+    cards = {pk: cached[key] for pk, key in keys.items() if key in cached}
+    attach_thumbnails(post for post in posts if post.pk not in cards)
+    return cards
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts):
+    attach_thumbnails(posts)
+    return ''
+
+
+@register.simple_tag
+def post_card(post, cards):
+    html = cards.get(post.pk)
+    if html is None:
+        html = render_to_string('includes/post_card.html', {'post': post})
+        cache.set(card_key(post), html, CARD_TIMEOUT)
+    return mark_safe(html)
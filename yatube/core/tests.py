@@ -0,0 +1,281 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import TestCase, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.test import Client, SimpleTestCase, override_settings
+from django.test import TestCase as DjangoTestCase
+from django.urls import reverse
+
+from posts.models import Post
+
+from .cache.layered import L1State, LayeredCache, _states
+from .cache.sqlite import SQLiteCache
+from .checks import check_shared_caches
+from .middleware import SlidingWindow, parse_rate
+
+
+def incr_many(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(
+            self.location,
+            {'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_INTERVAL': 1}})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_get_set_many(self):
+        self.cache.set_many({'a': 1, 'b': {'list': [1, 2]}})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']),
+            {'a': 1, 'b': {'list': [1, 2]}},
+        )
+        self.assertEqual(self.cache.get('c', 'default'), 'default')
+
+    def test_timeout(self):
+        self.cache.set('short', 'value', 0.05)
+        self.assertFalse(self.cache.add('short', 'other'))
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertTrue(self.cache.add('short', 'other'))
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.LRU_RESOLUTION = 0
+        self.cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.cache.get('a')
+        self.cache.set('d', 4)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get_many(['a', 'd']), {'a': 1, 'd': 4})
+
+    def test_cull_runs_once_per_interval(self):
+        cache = SQLiteCache(
+            self.location,
+            {'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_INTERVAL': 5}})
+        counts = []
+        cache._db.set_trace_callback(
+            lambda sql: 'COUNT(*)' in sql and counts.append(sql))
+        cache.set_many({'a': 1, 'b': 2, 'c': 3, 'd': 4})
+        self.assertEqual((counts, len(cache.get_many('abcd'))), ([], 4))
+        cache.add('e', 5)
+        self.assertTrue(counts)
+        self.assertLessEqual(len(cache.get_many('abcde')), 3)
+
+    def test_incr(self):
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    @skipUnless(hasattr(os, 'fork'), 'нужен fork')
+    def test_shared_between_processes(self):
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=incr_many,
+                                   args=(self.location, 50))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'layered-l2',
+    },
+})
+class LayeredCacheTest(SimpleTestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        self.params = {
+            'OPTIONS': {'L1_MAX_ENTRIES': 2, 'MAX_STALENESS': 0}}
+        _states.pop('shared', None)
+        self.cache = LayeredCache('shared', self.params)
+        # Экземпляр «другого процесса» со своим L1.
+        self.other = LayeredCache('shared', self.params)
+        self.other._state = L1State()
+
+    def test_hits_and_misses_per_tier(self):
+        self.cache.set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.other.get('key'), 'value')
+        self.assertEqual(self.other.get('key'), 'value')
+        self.assertIsNone(self.other.get('missing'))
+        self.assertEqual(self.cache.stats['l1_hits'], 1)
+        self.assertEqual(self.other.stats['l1_hits'], 1)
+        self.assertEqual(self.other.stats['l2_hits'], 1)
+        self.assertEqual(self.other.stats['l2_misses'], 1)
+
+    def test_write_elsewhere_invalidates_l1(self):
+        self.cache.set('version', 1)
+        self.assertEqual(self.other.get('version'), 1)
+        self.cache.incr('version')
+        self.assertEqual(self.other.get('version'), 2)
+        self.cache.delete('version')
+        self.assertIsNone(self.other.get('version'))
+
+    def test_unrelated_write_keeps_l1(self):
+        self.cache.set('key', 'value')
+        self.assertEqual(self.other.get('key'), 'value')
+        self.cache.set('another', 1)
+        self.cache.incr('another')
+        self.assertEqual(self.other.get('key'), 'value')
+        self.assertEqual(self.other.stats['l1_hits'], 1)
+
+    def test_lost_log_clears_l1(self):
+        self.cache.set('key', 'old')
+        self.assertEqual(self.other.get('key'), 'old')
+        self.cache.set('key', 'new')
+        caches['shared'].clear()
+        caches['shared'].set('key', 'new')
+        self.assertEqual(self.other.get('key'), 'new')
+
+    def test_incr_keeps_l2_expiry(self):
+        self.cache.set('counter', 1, timeout=1)
+        self.assertEqual(self.cache.incr('counter'), 2)
+        self.assertEqual(self.cache.get('counter'), 2)
+        time.sleep(1.1)
+        self.assertIsNone(self.cache.get('counter'))
+
+    def test_staleness_is_bounded_by_interval(self):
+        self.other._max_staleness = 60
+        self.cache.set('key', 'old')
+        self.assertEqual(self.other.get('key'), 'old')
+        self.cache.set('key', 'new')
+        self.assertEqual(self.other.get('key'), 'old')
+        self.other._state.checked = 0
+        self.assertEqual(self.other.get('key'), 'new')
+
+    def test_l1_is_bounded(self):
+        self.cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(len(self.cache._l1), 2)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertEqual(self.cache.stats['l2_hits'], 1)
+
+    def test_l1_is_shared_between_threads(self):
+        self.cache.set('key', 'value')
+        found = []
+        thread = threading.Thread(target=lambda: found.append(
+            LayeredCache('shared', self.params).get('key')))
+        thread.start()
+        thread.join()
+        self.assertEqual(found, ['value'])
+        self.assertEqual(self.cache.stats['l1_hits'], 1)
+        self.assertEqual(self.cache.stats['l2_hits'], 0)
+
+
+class SlidingWindowTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.window = SlidingWindow(cache, *parse_rate('3/m'))
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('5/hour'), (5, 3600))
+
+    def test_limit_within_window(self):
+        self.assertEqual(
+            [self.window.hit('key', now=60 + i) for i in range(4)],
+            [0, 0, 0, 57])
+
+    def test_previous_window_slides_out(self):
+        for _ in range(3):
+            self.window.hit('key', now=119)
+        self.assertTrue(self.window.hit('key', now=130))
+        self.assertEqual(self.window.hit('key', now=175), 0)
+
+
+@override_settings(RATE_LIMITS={
+    'posts:add_comment': {'user': '2/m', 'ip': '3/m'},
+    'users:signup': {'ip': '1/h'},
+})
+class RateLimitMiddlewareTest(DjangoTestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.author = User.objects.create_user(username='spammer')
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.post = Post.objects.create(text='Пост', author=self.author)
+        self.url = reverse('posts:add_comment', args=[self.post.pk])
+
+    def test_user_limit_returns_cheap_429(self):
+        for _ in range(2):
+            response = self.client.post(self.url, {'text': 'Спам'})
+            self.assertEqual(response.status_code, 302)
+        with self.assertNumQueries(0):
+            response = self.client.post(self.url, {'text': 'Спам'})
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(int(response['Retry-After']) > 0)
+        self.assertEqual(self.post.comments.count(), 2)
+
+    def test_limits_are_per_user_and_per_ip(self):
+        for _ in range(2):
+            self.client.post(self.url, {'text': 'Спам'})
+        other = Client()
+        other.force_login(
+            get_user_model().objects.create_user(username='neighbour'))
+        self.assertEqual(other.post(self.url, {'text': 'Ок'}).status_code,
+                         302)
+        self.assertEqual(other.post(self.url, {'text': 'Ок'}).status_code,
+                         429)
+        remote = Client(REMOTE_ADDR='10.0.0.1')
+        remote.force_login(
+            get_user_model().objects.create_user(username='remote'))
+        self.assertEqual(remote.post(self.url, {'text': 'Ок'}).status_code,
+                         302)
+
+    def test_only_limited_methods_are_counted(self):
+        url = reverse('users:signup')
+        for _ in range(3):
+            self.assertEqual(Client().get(url).status_code, 200)
+        Client().post(url, {})
+        self.assertEqual(Client().post(url, {}).status_code, 429)
+
+
+LOCMEM = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+SQLITE = {'BACKEND': 'core.cache.sqlite.SQLiteCache',
+          'LOCATION': os.path.join(tempfile.gettempdir(), 'check.sqlite3')}
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+    def check_ids(self):
+        return [error.id for error in check_shared_caches(None)]
+
+    def test_shared_cache_passes(self):
+        with override_settings(CACHES={'default': SQLITE}):
+            self.assertEqual(self.check_ids(), [])
+
+    def test_per_process_cache_is_rejected(self):
+        with override_settings(CACHES={'default': LOCMEM}):
+            self.assertEqual(self.check_ids(), ['core.E001', 'core.E002'])
+        with override_settings(
+                CACHES={'default': LOCMEM},
+                SESSION_ENGINE='django.contrib.sessions.backends.db',
+                RATE_LIMITS={}):
+            self.assertEqual(self.check_ids(), [])
+
+    def test_layered_cache_is_judged_by_l2(self):
+        layered = {'BACKEND': 'core.cache.layered.LayeredCache',
+                   'LOCATION': 'shared'}
+        with override_settings(CACHES={'default': layered, 'shared': SQLITE}):
+            self.assertEqual(self.check_ids(), [])
+        with override_settings(CACHES={'default': layered, 'shared': LOCMEM}):
+            self.assertEqual(self.check_ids(), ['core.E001', 'core.E002'])
@@ -1,6 +1,43 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.db.models.expressions import RawSQL
 
 from .models import Post, Group, Comment, Follow
+from .paginator import EstimatedCountPaginator
+from .search import fts_query, is_available, search_ids_sql
+
+
+class RowAutocompleteSelect(AutocompleteSelect):
+    """Автокомплит, который берёт выбранный объект из строки списка.
+
+    Обычный AutocompleteSelect делает запрос за выбранным значением
+    в каждой строке list_editable; здесь объект уже пришёл через
+    list_select_related.
+    """
+
+    selected_object = None
+
+    def optgroups(self, name, value, attr=None):
+        obj = self.selected_object
+        if obj is None or [str(obj.pk)] != [str(v) for v in value]:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        options.append(self.create_option(
+            name, obj.pk, self.choices.field.label_from_instance(obj),
+            True, len(options)))
+        return [(None, options, 0)]
+
+
+class PostChangeListForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name, field in self.fields.items():
+            widget = getattr(field.widget, 'widget', field.widget)
+            if isinstance(widget, RowAutocompleteSelect):
+                widget.selected_object = getattr(self.instance, name)
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -12,14 +49,44 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
+    # Ссылки фильтра по дате строятся без запросов, а date_hierarchy
+    # ходит по индексу post_pub_date_idx.
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.autocomplete_fields:
+            kwargs.setdefault('widget', RowAutocompleteSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using')))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', PostChangeListForm)
+        return super().get_changelist_form(request, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по индексу FTS5 вместо LIKE по всей таблице."""
+        if not is_available() or not fts_query(search_term):
+            return super().get_search_results(
+                request, queryset, search_term)
+        ids = RawSQL(*search_ids_sql(search_term))
+        return queryset.filter(pk__in=ids), False
+
+
+class GroupAdmin(admin.ModelAdmin):
+    search_fields = ('title', 'slug')
+
 
 admin.site.register(Post, PostAdmin),
 
-admin.site.register(Group)
+admin.site.register(Group, GroupAdmin)
 
 admin.site.register(Comment)
 
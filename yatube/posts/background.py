@@ -0,0 +1,40 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+
+_executor = None
+
+
+def get_workers():
+    return getattr(settings, 'BACKGROUND_WORKERS', 1)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=get_workers(), thread_name_prefix='background')
+    return _executor
+
+
+def call_in_worker(func, *args):
+    try:
+        return func(*args)
+    finally:
+        # У каждого потока пула своё соединение с БД.
+        connection.close()
+
+
+def run_after_commit(func, *args):
+    """После коммита запускает func(*args) вне запроса.
+
+    При BACKGROUND_WORKERS = 0 функция выполняется сразу после
+    коммита в том же потоке.
+    """
+    def submit():
+        if get_workers():
+            get_executor().submit(call_in_worker, func, *args)
+        else:
+            func(*args)
+    transaction.on_commit(submit)
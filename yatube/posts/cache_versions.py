@@ -0,0 +1,111 @@
+import time
+
+from django.core.cache import cache
+
+from .models import Group, Post, User
+
+USER_DISPLAY_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+def version_key(scope):
+    return f'cache_version:{scope}'
+
+
+def modified_key(scope):
+    return f'cache_modified:{scope}'
+
+
+def get_version(scope):
+    """Текущая версия фрагментов scope; входит в ключ {% cache %}.
+
+    Начальное значение берётся из часов, чтобы после вытеснения ключа
+    версия не вернулась к уже использованному числу.
+    """
+    key = version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_versions(*scopes):
+    scopes = set(scopes)
+    for scope in scopes:
+        try:
+            cache.incr(version_key(scope))
+        except ValueError:
+            cache.set(version_key(scope), time.time_ns(), None)
+    now = int(time.time())
+    cache.set_many({modified_key(scope): now for scope in scopes}, None)
+
+
+def get_validator(*scopes):
+    """Версии scope для ETag и время их последнего изменения.
+
+    Обычно это один get_many; для scope, которые ещё не менялись,
+    за время изменения принимается первое обращение.
+    """
+    keys = [version_key(scope) for scope in scopes]
+    keys += [modified_key(scope) for scope in scopes]
+    values = cache.get_many(keys)
+    versions = []
+    last_modified = 0
+    for scope in scopes:
+        version = values.get(version_key(scope))
+        if version is None:
+            version = get_version(scope)
+        modified = values.get(modified_key(scope))
+        if modified is None:
+            cache.add(modified_key(scope), int(time.time()), None)
+            modified = cache.get(modified_key(scope))
+        versions.append(f'{scope}={version}')
+        last_modified = max(last_modified, modified)
+    return ';'.join(versions), last_modified
+
+
+def post_scopes(author_id, *group_ids):
+    scopes = ['index', f'profile:{author_id}']
+    scopes.extend(f'group:{pk}' for pk in group_ids if pk)
+    return scopes
+
+
+def index_validator(request):
+    return get_validator('index')
+
+
+def group_validator(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    if group_id is None:
+        return None
+    return get_validator(f'group:{group_id}')
+
+
+def profile_validator(request, username):
+    user_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    if user_id is None:
+        return None
+    return get_validator(f'profile:{user_id}', f'follows:{user_id}')
+
+
+def author_validator(request, username):
+    """Как profile_validator, но без подписок: для ленты записей автора."""
+    user_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    if user_id is None:
+        return None
+    return get_validator(f'profile:{user_id}')
+
+
+def post_validator(request, post_id):
+    post = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group_id').first()
+    if post is None:
+        return None
+    author_id, group_id = post
+    scopes = [f'post:{post_id}', f'profile:{author_id}']
+    if group_id:
+        scopes.append(f'group:{group_id}')
+    return get_validator(*scopes)
@@ -0,0 +1,155 @@
+from django.db.models import CharField, Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Concat, LPad
+
+from .models import (COMMENT_MAX_DEPTH, COMMENT_PATH_WIDTH, Comment, Follow,
+                     Post, StoredImage, User, UserStats, path_ids)
+
+
+def get_user_stats(user):
+    return UserStats.objects.get_or_create(user=user)[0]
+
+
+def bump(queryset, field, delta):
+    """Атомарно сдвигает счётчик, не опуская его ниже нуля."""
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def bump_user_stats(user_id, field, delta):
+    stats = UserStats.objects.filter(user_id=user_id)
+    if not bump(stats, field, delta) and delta > 0:
+        UserStats.objects.get_or_create(user_id=user_id)
+        bump(stats, field, delta)
+
+
+def bump_comments_count(post_id, delta):
+    bump(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def bump_replies_count(path, delta):
+    """Сдвигает счётчики ответов у всех комментариев пути."""
+    if path:
+        bump(Comment.objects.filter(pk__in=path_ids(path)),
+             'replies_count', delta)
+
+
+def bump_image_refcount(name, delta):
+    if not name:
+        return
+    images = StoredImage.objects.filter(name=name)
+    if not bump(images, 'refcount', delta) and delta > 0:
+        StoredImage.objects.get_or_create(name=name)
+        bump(images, 'refcount', delta)
+
+
+def count_subquery(queryset, field, outer_field='pk'):
+    """Коррелированный COUNT(*) по field = OuterRef(outer_field) для UPDATE."""
+    counts = (
+        queryset.filter(**{field: OuterRef(outer_field)})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def reconcile_counters(users=None, posts=None):
+    """Пересчитывает счётчики: по одному UPDATE на таблицу.
+
+    users и posts — id, которыми ограничить пересчёт; по умолчанию
+    пересчитывается всё.
+    """
+    missing = User.objects.filter(stats__isnull=True)
+    stats = UserStats.objects.all()
+    if users is not None:
+        missing = missing.filter(pk__in=users)
+        stats = stats.filter(user_id__in=users)
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk)
+         for pk in missing.values_list('pk', flat=True).iterator()),
+        batch_size=500,
+    )
+    stats = stats.update(
+        posts_count=count_subquery(Post.objects, 'author'),
+        followers_count=count_subquery(Follow.objects, 'author'),
+        following_count=count_subquery(Follow.objects, 'user'),
+    )
+    post_rows = Post.objects.all()
+    if posts is not None:
+        post_rows = post_rows.filter(pk__in=posts)
+    posts_updated = post_rows.update(
+        comments_count=count_subquery(Comment.objects, 'post'))
+    reconcile_comment_threads(posts)
+    return stats, posts_updated
+
+
+def fill_comment_paths():
+    """Пути для комментариев из bulk_create, по уровню веток за UPDATE.
+
+    Ответы глубже COMMENT_MAX_DEPTH встают рядом с родителем, как
+    в Comment.save().
+    """
+    segment = LPad(Cast('pk', CharField()), COMMENT_PATH_WIDTH, Value('0'))
+    Comment.objects.filter(path='', parent__isnull=True).update(path=segment)
+    parent_path = Comment.objects.filter(
+        pk=OuterRef('parent_id')).values('path')[:1]
+    full_path = f'^.{{{COMMENT_PATH_WIDTH * COMMENT_MAX_DEPTH}}}'
+    while True:
+        too_deep = Comment.objects.filter(
+            path='', parent__path__regex=full_path).values_list(
+            'pk', 'parent__parent_id')
+        for pk, grandparent_id in too_deep:
+            Comment.objects.filter(pk=pk).update(parent_id=grandparent_id)
+        filled = Comment.objects.filter(path='', parent__path__gt='').update(
+            path=Concat(Subquery(parent_path), segment,
+                        output_field=CharField()))
+        if not filled:
+            return
+
+
+def reconcile_comment_threads(posts=None):
+    """Пути для комментариев из bulk_create и счётчики ответов.
+
+    posts ограничивает пересчёт ответов комментариями этих постов.
+    """
+    fill_comment_paths()
+    descendants = (
+        Comment.objects.filter(
+            post=OuterRef('post'),
+            path__gt=OuterRef('path'),
+            path__lt=Concat(OuterRef('path'), Value('~')),
+        )
+        .order_by()
+        .values('post')
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    comments = Comment.objects.all()
+    if posts is not None:
+        comments = comments.filter(post_id__in=posts)
+    return comments.update(
+        replies_count=Coalesce(Subquery(descendants), Value(0)))
+
+
+def reconcile_image_refcounts(names=None):
+    """Пересчитывает ссылки на файлы картинок по таблице постов.
+
+    names ограничивает пересчёт этими файлами; по умолчанию — все.
+    """
+    posts = Post.objects.exclude(image='')
+    images = StoredImage.objects.all()
+    if names is not None:
+        posts = posts.filter(image__in=names)
+        images = images.filter(name__in=names)
+    new_names = posts.exclude(
+        image__in=StoredImage.objects.values('name')).order_by().values_list(
+        'image', flat=True).distinct()
+    StoredImage.objects.bulk_create(
+        (StoredImage(name=name) for name in new_names.iterator()),
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    return images.update(
+        refcount=count_subquery(Post.objects, 'image', 'name'))
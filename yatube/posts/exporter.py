@@ -0,0 +1,157 @@
+import datetime
+import json
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Comment, Follow, Group, Post, User
+
+CHUNK_SIZE = 2000
+# Столько байт NDJSON собирается перед отдачей клиенту или в файл.
+BUFFER_SIZE = 64 * 1024
+
+# Порядок как у import_yatube: строки ссылаются только на типы левее.
+RECORD_TYPES = ('user', 'group', 'post', 'comment', 'follow')
+
+
+def parse_bound(value, end=False):
+    """Дата или дата со временем из фильтра; день целиком для end."""
+    if not value:
+        return None
+    date = parse_datetime(value)
+    if date is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Не разобрать дату {value!r}')
+        if end:
+            day += datetime.timedelta(days=1)
+        date = datetime.datetime.combine(day, datetime.time())
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def filter_posts(author=None, group=None, since=None, until=None):
+    posts = Post.objects.order_by('pk')
+    if author:
+        posts = posts.filter(author__username=author)
+    if group:
+        posts = posts.filter(group__slug=group)
+    if since:
+        posts = posts.filter(pub_date__gte=since)
+    if until:
+        posts = posts.filter(pub_date__lt=until)
+    return posts
+
+
+def user_records(users):
+    rows = users.values_list('username', 'first_name', 'last_name', 'email')
+    for username, first_name, last_name, email in rows.iterator(CHUNK_SIZE):
+        record = {'type': 'user', 'username': username}
+        for field, value in (('first_name', first_name),
+                             ('last_name', last_name), ('email', email)):
+            if value:
+                record[field] = value
+        yield record
+
+
+def group_records(groups):
+    rows = groups.values_list('title', 'slug', 'description')
+    for title, slug, description in rows.iterator(CHUNK_SIZE):
+        yield {'type': 'group', 'title': title, 'slug': slug,
+               'description': description}
+
+
+def post_records(posts):
+    rows = posts.values_list(
+        'pk', 'text', 'author__username', 'group__slug', 'image', 'pub_date')
+    for pk, text, username, slug, image, pub_date in rows.iterator(
+            CHUNK_SIZE):
+        record = {'type': 'post', 'id': pk, 'text': text,
+                  'author': username, 'pub_date': pub_date.isoformat()}
+        if slug:
+            record['group'] = slug
+        if image:
+            record['image'] = image
+        yield record
+
+
+def comment_records(comments):
+    """Комментарии с id и parent, чтобы импорт восстановил ветки."""
+    rows = comments.values_list(
+        'pk', 'post_id', 'parent_id', 'text', 'author__username', 'created')
+    for pk, post_id, parent_id, text, username, created in rows.iterator(
+            CHUNK_SIZE):
+        record = {'type': 'comment', 'id': pk, 'post': post_id,
+                  'text': text, 'author': username,
+                  'created': created.isoformat()}
+        if parent_id:
+            record['parent'] = parent_id
+        yield record
+
+
+def follow_records(follows):
+    rows = follows.values_list('user__username', 'author__username')
+    for username, author in rows.iterator(CHUNK_SIZE):
+        yield {'type': 'follow', 'user': username, 'author': author}
+
+
+def referenced_users(types, posts, comments, follows):
+    """Авторы и подписчики из выбранных типов записей, без повторов."""
+    referenced = Q(pk__in=[])
+    if 'post' in types:
+        referenced |= Q(pk__in=posts.values('author'))
+    if 'comment' in types:
+        referenced |= Q(pk__in=comments.values('author'))
+    if 'follow' in types:
+        referenced |= (Q(pk__in=follows.values('user'))
+                       | Q(pk__in=follows.values('author')))
+    return User.objects.filter(referenced).order_by('pk')
+
+
+def export_records(types=RECORD_TYPES, author=None, group=None,
+                   since=None, until=None):
+    """Записи для NDJSON в формате import_yatube, по одной за раз.
+
+    Фильтры по автору (username), группе (slug) и датам [since, until)
+    относятся к постам; комментарии выгружаются к тем же постам.
+    Подписки фильтруются только по автору. Пользователи и группы
+    выгружаются первыми и только те, на кого ссылаются выбранные
+    записи, так что выгрузка загружается в пустую базу. Строки
+    читаются через iterator() порциями по CHUNK_SIZE, без кэша
+    QuerySet.
+    """
+    posts = filter_posts(author, group, since, until)
+    comments = Comment.objects.order_by('pk')
+    if author or group or since or until:
+        comments = comments.filter(post__in=posts.values('pk'))
+    follows = Follow.objects.order_by('pk')
+    if author:
+        follows = follows.filter(author__username=author)
+    if 'user' in types:
+        yield from user_records(
+            referenced_users(types, posts, comments, follows))
+    if 'group' in types:
+        yield from group_records(Group.objects.filter(
+            pk__in=posts.values('group')).order_by('pk'))
+    if 'post' in types:
+        yield from post_records(posts)
+    if 'comment' in types:
+        yield from comment_records(comments)
+    if 'follow' in types:
+        yield from follow_records(follows)
+
+
+def to_ndjson(records):
+    """Склеивает записи в куски NDJSON около BUFFER_SIZE байт."""
+    buffer, size = [], 0
+    for record in records:
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= BUFFER_SIZE:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
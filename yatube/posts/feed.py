@@ -0,0 +1,208 @@
+import heapq
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import F
+
+from .models import FeedItem, Follow, Post, UserStats
+
+BATCH_SIZE = 500
+
+FEED_KEYS = {'date_field': 'feed_date', 'id_field': 'feed_post'}
+
+
+def get_pull_threshold():
+    return getattr(settings, 'FEED_PULL_THRESHOLD', 10000)
+
+
+def get_push_threshold():
+    """Ниже этого числа подписчиков автор возвращается к раскладке.
+
+    Порог ниже FEED_PULL_THRESHOLD, чтобы подписки и отписки на
+    границе не раскладывали посты автора по кругу.
+    """
+    return getattr(settings, 'FEED_PUSH_THRESHOLD', get_pull_threshold() // 2)
+
+
+def get_backfill_limit():
+    return getattr(settings, 'FEED_BACKFILL_LIMIT', 200)
+
+
+def is_pull_author(author_id):
+    """Посты авторов с большим числом подписчиков не раскладываются."""
+    return UserStats.objects.filter(user_id=author_id, feed_pull=True).exists()
+
+
+def get_pull_authors(user):
+    return list(
+        Follow.objects.filter(
+            user=user, author__stats__feed_pull=True,
+        ).values_list('author_id', flat=True)
+    )
+
+
+def start_pulling(*author_ids):
+    """Переводит авторов на подмешивание при чтении, если пора."""
+    UserStats.objects.filter(
+        user_id__in=author_ids,
+        feed_pull=False,
+        followers_count__gte=get_pull_threshold(),
+    ).update(feed_pull=True)
+
+
+def stop_pulling(author_id):
+    """Возвращает автора к раскладке; True, если он только что вернулся."""
+    return bool(UserStats.objects.filter(
+        user_id=author_id,
+        feed_pull=True,
+        followers_count__lt=get_push_threshold(),
+    ).update(feed_pull=False))
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост в ленты всех подписчиков автора."""
+    fan_out_posts([post])
+
+
+def fan_out_posts(posts):
+    """Раскладывает новые посты; подписчики автора читаются один раз."""
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+    pull_authors = set(UserStats.objects.filter(
+        user_id__in=by_author, feed_pull=True).values_list(
+        'user_id', flat=True))
+    for author_id, author_posts in by_author.items():
+        if author_id in pull_authors:
+            continue
+        followers = Follow.objects.filter(
+            author_id=author_id).values_list('user_id', flat=True)
+        FeedItem.objects.bulk_create(
+            (FeedItem(user_id=user_id, post=post, pub_date=post.pub_date)
+             for user_id in followers.iterator() for post in author_posts),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+
+def backfill_feed(user_id, author_id):
+    """Кладёт в ленту последние FEED_BACKFILL_LIMIT постов автора.
+
+    Более старые нужны только на дальних страницах, а копировать
+    всю историю плодовитого автора при подписке слишком дорого.
+    """
+    if is_pull_author(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id').values_list('id', 'pub_date')[
+        :get_backfill_limit()]
+    FeedItem.objects.bulk_create(
+        (FeedItem(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_author_followers(author_id):
+    """Раскладывает последние посты автора в ленты его подписчиков.
+
+    Нужна после stop_pulling(): посты и подписки, появившиеся, пока
+    автор подмешивался при чтении, в FeedItem не попали. Каждому
+    подписчику, как и при подписке, достаётся не больше
+    FEED_BACKFILL_LIMIT постов.
+    """
+    if is_pull_author(author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    for user_id in followers.iterator():
+        backfill_feed(user_id, author_id)
+
+
+def prune_feed(user_id, author_id):
+    FeedItem.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def rebuild_feeds():
+    UserStats.objects.update(feed_pull=False)
+    UserStats.objects.filter(
+        followers_count__gte=get_pull_threshold()).update(feed_pull=True)
+    FeedItem.objects.all().delete()
+    follows = Follow.objects.values_list('user_id', 'author_id')
+    for user_id, author_id in follows.iterator():
+        backfill_feed(user_id, author_id)
+    return FeedItem.objects.count()
+
+
+class MergedFeed:
+    """K-way слияние отсортированных по дате потоков постов.
+
+    Поддерживает ровно то, что нужно Paginator и CursorPaginator:
+    count(), срезы, filter() и order_by().
+    """
+
+    def __init__(self, streams, reverse=True):
+        self.streams = streams
+        self.reverse = reverse
+
+    def count(self):
+        return sum(stream.count() for stream in self.streams)
+
+    def __len__(self):
+        return self.count()
+
+    def filter(self, *args, **kwargs):
+        return MergedFeed(
+            [stream.filter(*args, **kwargs) for stream in self.streams],
+            self.reverse,
+        )
+
+    def order_by(self, *fields):
+        return MergedFeed(
+            [stream.order_by(*fields) for stream in self.streams],
+            fields[0].startswith('-'),
+        )
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start, stop = key.start or 0, key.stop
+        merged = heapq.merge(
+            *(stream[:stop] if stop is not None else stream
+              for stream in self.streams),
+            key=lambda post: (post.feed_date, post.feed_post),
+            reverse=self.reverse,
+        )
+        return list(islice(merged, start, stop))
+
+
+def get_follow_feed(user):
+    """Лента подписок: разложенные посты плюс посты популярных авторов.
+
+    Посты популярных авторов не пишутся в FeedItem, а подмешиваются
+    при чтении из их собственных отсортированных потоков. Все потоки
+    упорядочены по ключам FEED_KEYS: для разложенных постов это колонки
+    FeedItem, чтобы чтение шло по индексу (user, -pub_date, -post).
+    """
+    pull_authors = get_pull_authors(user)
+    posts = Post.objects.select_related('author', 'group')
+    pushed = posts.filter(feed_items__user=user).annotate(
+        feed_date=F('feed_items__pub_date'),
+        feed_post=F('feed_items__post_id'),
+    ).order_by('-feed_date', '-feed_post')
+    if not pull_authors:
+        return pushed
+    streams = [pushed.exclude(author_id__in=pull_authors)]
+    streams.extend(
+        posts.filter(author_id=author_id).annotate(
+            feed_date=F('pub_date'), feed_post=F('id'),
+        ).order_by('-feed_date', '-feed_post')
+        for author_id in pull_authors
+    )
+    return MergedFeed(streams)
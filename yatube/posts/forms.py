@@ -23,6 +23,22 @@ class PostForm(forms.ModelForm):
             },
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        image = self.files.get('image')
+        # Файл, отклонённый BoundedImageUploadHandler, полю не передаём:
+        # его ошибка показывается вместо общей «загрузите картинку».
+        self.upload_error = getattr(image, 'upload_error', None)
+        if self.upload_error:
+            self.files = self.files.copy()
+            self.files.pop('image')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.upload_error:
+            self.add_error('image', self.upload_error)
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,59 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from posts.feed import get_follow_feed
+from posts.models import FeedItem, Follow, Post
+from posts.paginator import POST_COUNT
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает push и pull ленты: усиление записи и время чтения. '
+            'Все созданные данные откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--followers', type=int, default=5000)
+        parser.add_argument('--posts', type=int, default=50)
+        parser.add_argument('--reads', type=int, default=100)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            author, reader = self.make_audience(options['followers'])
+            for mode, threshold in (('push', options['followers'] + 1),
+                                    ('pull', 1)):
+                with override_settings(FEED_PULL_THRESHOLD=threshold):
+                    self.run(mode, author, reader, options)
+            transaction.set_rollback(True)
+
+    def make_audience(self, followers):
+        author = User.objects.create(username='bench_author')
+        User.objects.bulk_create(
+            User(username=f'bench_reader_{i}') for i in range(followers))
+        users = User.objects.filter(username__startswith='bench_reader_')
+        Follow.objects.bulk_create(
+            Follow(user=user, author=author) for user in users)
+        return author, users.first()
+
+    def run(self, mode, author, reader, options):
+        rows_before = FeedItem.objects.count()
+        started = time.perf_counter()
+        for i in range(options['posts']):
+            Post.objects.create(text=f'bench {mode} {i}', author=author)
+        write_time = time.perf_counter() - started
+        rows = FeedItem.objects.count() - rows_before
+
+        started = time.perf_counter()
+        for _ in range(options['reads']):
+            list(get_follow_feed(reader)[:POST_COUNT])
+        read_time = time.perf_counter() - started
+
+        self.stdout.write(
+            f'{mode}: {rows / options["posts"]:.0f} строк ленты на пост, '
+            f'запись {write_time / options["posts"] * 1000:.2f} мс/пост, '
+            f'чтение {read_time / options["reads"] * 1000:.2f} мс/страница'
+        )
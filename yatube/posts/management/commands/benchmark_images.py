@@ -0,0 +1,86 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageOps
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+from posts.thumbnails import (POST_THUMBNAIL_GEOMETRY, POST_THUMBNAIL_WIDTHS,
+                              variant_formats, variant_geometry)
+
+BASE_WIDTH = int(POST_THUMBNAIL_GEOMETRY.split('x')[0])
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+
+# Ширина, которую браузер выберет из srcset для типичных экранов.
+CLIENTS = {
+    'телефон 1x': 380,
+    'телефон 2x': 760,
+    'десктоп 1x': 760,
+    'десктоп 2x': 1140,
+}
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает объём одной миниатюры 760px JPEG с вариантами '
+            'из srcset (разные ширины и WebP)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default=os.path.join(settings.BASE_DIR, 'static', 'img'))
+
+    def handle(self, *args, **options):
+        formats = [image_format or 'JPEG'
+                   for image_format in variant_formats()]
+        totals = {'JPEG 760 (сейчас)': 0}
+        for root, _, files in os.walk(options['path']):
+            for filename in sorted(files):
+                if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                sizes = self.encode(os.path.join(root, filename), formats)
+                baseline = sizes[('JPEG', POST_THUMBNAIL_GEOMETRY)]
+                totals['JPEG 760 (сейчас)'] += baseline * len(CLIENTS)
+                self.stdout.write(f'{filename}: JPEG 760 — {baseline:,} Б')
+                for client, width in CLIENTS.items():
+                    if ('JPEG', variant_geometry(width)) not in sizes:
+                        # Как и в srcset, шире исходника варианта нет.
+                        width = BASE_WIDTH
+                    line = []
+                    for image_format in formats:
+                        size = sizes[(image_format, variant_geometry(width))]
+                        label = f'{image_format} {width}'
+                        totals[label] = totals.get(label, 0) + size
+                        line.append(f'{image_format} {size:,} Б '
+                                    f'({size / baseline - 1:+.0%})')
+                    self.stdout.write(f'  {client}: ' + ', '.join(line))
+        self.report(totals, formats)
+
+    def encode(self, path, formats):
+        with Image.open(path) as source:
+            source = source.convert('RGB')
+            sizes = {}
+            for width in POST_THUMBNAIL_WIDTHS:
+                if width > max(BASE_WIDTH, source.width):
+                    continue
+                geometry = variant_geometry(width)
+                size = tuple(map(int, geometry.split('x')))
+                image = ImageOps.fit(source, size, Image.LANCZOS)
+                for image_format in formats:
+                    buffer = BytesIO()
+                    image.save(buffer, image_format,
+                               quality=thumbnail_settings.THUMBNAIL_QUALITY)
+                    sizes[(image_format, geometry)] = len(buffer.getvalue())
+        return sizes
+
+    def report(self, totals, formats):
+        baseline = totals.pop('JPEG 760 (сейчас)')
+        if not baseline:
+            self.stdout.write('Картинок не найдено')
+            return
+        for image_format in formats:
+            served = sum(size for label, size in totals.items()
+                         if label.startswith(image_format))
+            self.stdout.write(self.style.SUCCESS(
+                f'Отдано по srcset ({image_format}): {served:,} Б против '
+                f'{baseline:,} Б ({served / baseline - 1:+.0%})'))
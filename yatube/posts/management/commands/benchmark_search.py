@@ -0,0 +1,70 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts.models import Post
+from posts.paginator import POST_COUNT
+from posts.search import is_available, search_posts
+
+User = get_user_model()
+
+BATCH_SIZE = 10000
+VOCABULARY_SIZE = 20000
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает поиск по индексу FTS5 с LIKE: подсчёт совпадений '
+            'и первая страница. Все созданные данные откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--queries', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if not is_available():
+            raise CommandError('Индекс FTS5 есть только в SQLite')
+        with transaction.atomic():
+            words = self.make_posts(options['posts'])
+            # Частые, средние и редкие слова: по закону Ципфа выдача
+            # у них отличается на порядки.
+            for label, rank in (('частое', 0), ('среднее', 100),
+                                ('редкое', 5000)):
+                self.run(label, words[rank], options['queries'])
+            transaction.set_rollback(True)
+
+    def make_posts(self, count):
+        rng = random.Random(0)
+        words = [f'слово{i}' for i in range(VOCABULARY_SIZE)]
+        weights = [1 / (rank + 1) for rank in range(VOCABULARY_SIZE)]
+        author = User.objects.create(username='bench_search_author')
+        started = time.perf_counter()
+        for offset in range(0, count, BATCH_SIZE):
+            Post.objects.bulk_create(
+                Post(author=author,
+                     text=' '.join(rng.choices(words, weights, k=30)))
+                for _ in range(min(BATCH_SIZE, count - offset)))
+        self.stdout.write(
+            f'{count} постов записано за '
+            f'{time.perf_counter() - started:.1f} с вместе с индексом')
+        return words
+
+    def run(self, label, word, queries):
+        timings = {}
+        for name, search in (
+            ('LIKE', lambda: Post.objects.filter(text__icontains=word)),
+            ('FTS5', lambda: search_posts(word)),
+        ):
+            started = time.perf_counter()
+            for _ in range(queries):
+                results = search()
+                results.count()
+                list(results[:POST_COUNT])
+            timings[name] = (time.perf_counter() - started) / queries
+        self.stdout.write(
+            f'{label} слово «{word}»: '
+            + ', '.join(f'{name} {seconds * 1000:.1f} мс'
+                        for name, seconds in timings.items())
+        )
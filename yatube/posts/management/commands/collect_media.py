@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import reconcile_image_refcounts
+from posts.media import collect_unreferenced_images
+
+
+class Command(BaseCommand):
+    help = ('Удаляет картинки, на которые не ссылается ни один пост, '
+            'вместе с их миниатюрами')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=3600,
+                            help='Не трогать файлы моложе стольких секунд')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            reconcile_image_refcounts()
+        collected = collect_unreferenced_images(
+            timedelta(seconds=options['grace']), options['dry_run'])
+        for name in collected:
+            self.stdout.write(name)
+        verb = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} картинок: {len(collected)}'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exporter import RECORD_TYPES, export_records, parse_bound, to_ndjson
+
+
+class Command(BaseCommand):
+    help = ('Потоково выгружает пользователей, группы, посты, комментарии '
+            'и подписки в NDJSON в формате import_yatube')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default='-',
+                            help='Файл или - для stdout')
+        parser.add_argument(
+            '--types', default=','.join(RECORD_TYPES),
+            help='Через запятую: user, group, post, comment, follow')
+        parser.add_argument('--author', help='username автора')
+        parser.add_argument('--group', help='slug группы')
+        parser.add_argument('--since', help='Посты с этой даты')
+        parser.add_argument('--until', help='Посты до этой даты включительно')
+
+    def handle(self, *args, **options):
+        types = options['types'].split(',')
+        unknown = set(types) - set(RECORD_TYPES)
+        if unknown:
+            raise CommandError(f'Неизвестные типы: {", ".join(unknown)}')
+        try:
+            since = parse_bound(options['since'])
+            until = parse_bound(options['until'], end=True)
+        except ValueError as error:
+            raise CommandError(error)
+        chunks = to_ndjson(export_records(
+            types, options['author'], options['group'], since, until))
+        if options['output'] == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8') as stream:
+            stream.writelines(chunks)
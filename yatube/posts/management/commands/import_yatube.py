@@ -0,0 +1,47 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importer import BATCH_SIZE, READERS, Importer
+
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = ('Потоково импортирует пользователей, группы, посты, '
+            'комментарии и подписки из NDJSON или CSV с полем type')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или - для stdin')
+        parser.add_argument('--format', choices=sorted(READERS),
+                            help='По умолчанию — по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(path)[1][1:]
+        if file_format not in READERS:
+            raise CommandError('Укажите --format: ndjson или csv')
+        importer = self.importer = Importer(
+            options['batch_size'], self.report_progress, self.report_error)
+        if path == '-':
+            counts = importer.run(READERS[file_format](sys.stdin))
+        else:
+            with open(path, encoding='utf-8', newline='') as stream:
+                counts = importer.run(READERS[file_format](stream))
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано: пользователей {counts["user"]}, '
+            f'групп {counts["group"]}, постов {counts["post"]}, '
+            f'комментариев {counts["comment"]}, '
+            f'подписок {counts["follow"]}; '
+            f'пропущено {importer.skipped}; '
+            f'{importer.rate:.0f} строк/с'))
+
+    def report_progress(self, importer):
+        self.stdout.write(
+            f'{importer.rows} строк, {importer.rate:.0f} строк/с')
+
+    def report_error(self, line, message):
+        if self.importer.skipped <= MAX_REPORTED_ERRORS:
+            self.stderr.write(f'Строка {line}: {message}')
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts.thumbnails import iter_image_names, pregenerate_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие миниатюры картинок постов в несколько потоков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int)
+
+    def handle(self, *args, **options):
+        total = 0
+
+        def names():
+            nonlocal total
+            for name in iter_image_names():
+                total += 1
+                yield name
+
+        count = pregenerate_thumbnails(names(), options['workers'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры готовы: {count} из {total}'))
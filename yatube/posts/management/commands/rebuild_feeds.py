@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.feed import rebuild_feeds
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок с нуля'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_feeds()
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты пересобраны, записей: {count}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики постов и подписок'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            stats, posts = reconcile_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики пересчитаны: пользователей {stats}, постов {posts}'))
@@ -0,0 +1,53 @@
+import posixpath
+from datetime import timedelta
+from itertools import islice
+
+from django.core.cache import cache
+from django.utils import timezone
+from sorl.thumbnail import delete as delete_with_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from .models import Post, StoredImage
+from .thumbnails import thumbnail_cache_key
+
+BATCH_SIZE = 500
+
+
+def iter_files(storage, directory):
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield posixpath.join(directory, name)
+    for subdirectory in directories:
+        yield from iter_files(storage, posixpath.join(directory, subdirectory))
+
+
+def collect_unreferenced_images(grace=timedelta(hours=1), dry_run=False):
+    """Удаляет картинки постов без ссылок вместе с их миниатюрами.
+
+    Ссылки проверяются пачками по индексу StoredImage, а не по таблице
+    постов. Файлы моложе grace не трогаем: пост, который на них
+    сошлётся, может быть ещё не сохранён. Возвращает удалённые имена.
+    """
+    field = Post._meta.get_field('image')
+    storage = field.storage
+    if not storage.exists(field.upload_to):
+        return []
+    deadline = timezone.now() - grace
+    files = iter_files(storage, field.upload_to.rstrip('/'))
+    collected = []
+    for batch in iter(lambda: list(islice(files, BATCH_SIZE)), []):
+        referenced = set(StoredImage.objects.filter(
+            name__in=batch, refcount__gt=0).values_list('name', flat=True))
+        garbage = [name for name in batch if name not in referenced
+                   and storage.get_modified_time(name) < deadline]
+        if not dry_run:
+            for name in garbage:
+                delete_with_thumbnails(ImageFile(name, storage))
+            # Имена — хеши содержимого: та же картинка, загруженная
+            # заново, не должна получить srcset на удалённые файлы.
+            cache.delete_many(
+                [thumbnail_cache_key(name) for name in garbage])
+            StoredImage.objects.filter(
+                name__in=garbage, refcount=0).delete()
+        collected.extend(garbage)
+    return collected
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_auto_20261018_0606'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='revision',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Версия содержимого'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:23
+
+import core.storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_refcounts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    StoredImage = apps.get_model('posts', 'StoredImage')
+    references = (
+        Post.objects.exclude(image='')
+        .order_by()
+        .values('image')
+        .annotate(total=Count('*'))
+        .values_list('image', 'total')
+    )
+    StoredImage.objects.bulk_create(
+        [StoredImage(name=name, refcount=total)
+         for name, total in references],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_revision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Путь к файлу')),
+                ('refcount', models.PositiveIntegerField(default=0, verbose_name='Число ссылок')),
+            ],
+            options={
+                'verbose_name': 'Файл картинки',
+                'verbose_name_plural': 'Файлы картинок',
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=core.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(fill_refcounts, migrations.RunPython.noop),
+    ]
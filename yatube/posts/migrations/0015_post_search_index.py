@@ -0,0 +1,104 @@
+from django.conf import settings
+from django.db import migrations
+
+FTS_TABLE = 'posts_post_fts'
+
+AUTHOR_NAME = (
+    "(SELECT username || ' ' || first_name || ' ' || last_name "
+    "FROM {user} WHERE id = new.author_id)"
+)
+GROUP_TITLE = '(SELECT title FROM posts_group WHERE id = new.group_id)'
+
+CREATE = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        text, group_title, author_name,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    # Совпадение в тексте важнее, чем в названии группы или имени автора.
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rank) "
+    f"VALUES ('rank', 'bm25(10.0, 2.0, 1.0)')",
+    f"""
+    INSERT INTO {FTS_TABLE} (rowid, text, group_title, author_name)
+    SELECT new.id, new.text, {GROUP_TITLE}, {AUTHOR_NAME}
+    FROM posts_post AS new
+    """,
+    f"""
+    CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, text, group_title, author_name)
+        VALUES (new.id, new.text, {GROUP_TITLE}, {AUTHOR_NAME});
+    END
+    """,
+    f"""
+    CREATE TRIGGER posts_post_fts_update
+    AFTER UPDATE OF text, group_id, author_id ON posts_post
+    WHEN new.text IS NOT old.text OR new.group_id IS NOT old.group_id
+        OR new.author_id IS NOT old.author_id
+    BEGIN
+        UPDATE {FTS_TABLE} SET text = new.text,
+            group_title = {GROUP_TITLE}, author_name = {AUTHOR_NAME}
+        WHERE rowid = new.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER posts_group_fts_update AFTER UPDATE OF title ON posts_group
+    WHEN new.title IS NOT old.title
+    BEGIN
+        UPDATE {FTS_TABLE} SET group_title = new.title
+        WHERE rowid IN (SELECT id FROM posts_post WHERE group_id = new.id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER posts_user_fts_update
+    AFTER UPDATE OF username, first_name, last_name ON {{user}}
+    WHEN new.username IS NOT old.username
+        OR new.first_name IS NOT old.first_name
+        OR new.last_name IS NOT old.last_name
+    BEGIN
+        UPDATE {FTS_TABLE}
+        SET author_name = new.username || ' ' || new.first_name || ' '
+            || new.last_name
+        WHERE rowid IN (SELECT id FROM posts_post WHERE author_id = new.id);
+    END
+    """,
+]
+
+DROP = [
+    'DROP TRIGGER IF EXISTS posts_user_fts_update',
+    'DROP TRIGGER IF EXISTS posts_group_fts_update',
+    'DROP TRIGGER IF EXISTS posts_post_fts_delete',
+    'DROP TRIGGER IF EXISTS posts_post_fts_update',
+    'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        # Индекс на FTS5 есть только в SQLite; в других СУБД поиск
+        # откатывается к LIKE (см. posts.search).
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        user = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+        for statement in statements:
+            schema_editor.execute(statement.format(user=user))
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0014_stored_images'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE), run(DROP)),
+    ]
@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.shortcuts import reverse
 
+from core.storage import ContentAddressedStorage
+
 
 User = get_user_model()
 
@@ -42,6 +44,7 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
 
@@ -55,6 +58,16 @@ class Post(models.Model):
         help_text='Выберите группу'
 
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
+    revision = models.PositiveIntegerField(
+        'Версия содержимого',
+        default=1,
+        editable=False
+    )
 
     def __str__(self):
         return self.text[:15]
@@ -63,6 +76,21 @@ class Post(models.Model):
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
+
+
+# Путь комментария — id всех предков и его собственный, каждый
+# дополнен нулями до COMMENT_PATH_WIDTH знаков. Сортировка по пути
+# даёт порядок показа веток, а поддерево — это диапазон путей.
+COMMENT_PATH_WIDTH = 10
+COMMENT_MAX_DEPTH = 5
 
 
 class Comment(models.Model):
@@ -77,6 +105,14 @@ class Comment(models.Model):
         on_delete=models.CASCADE,
         related_name='comments'
     )
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        related_name='replies',
+        blank=True,
+        null=True,
+        verbose_name='Ответ на комментарий'
+    )
     text = models.TextField(
         verbose_name='Текст комментария',
         help_text='Напиши комментарий'
@@ -85,6 +121,55 @@ class Comment(models.Model):
         verbose_name='Дата публикации комментария',
         auto_now_add=True
     )
+    path = models.CharField(
+        'Путь в ветке',
+        max_length=COMMENT_PATH_WIDTH * COMMENT_MAX_DEPTH,
+        blank=True,
+        editable=False
+    )
+    replies_count = models.PositiveIntegerField(
+        'Число ответов в ветке',
+        default=0,
+        editable=False
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'],
+                         name='comment_post_created_idx'),
+            models.Index(fields=['post', 'path'],
+                         name='comment_post_path_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        if adding and self.parent_id and (
+                self.parent.depth >= COMMENT_MAX_DEPTH - 1):
+            # Глубже лимита не вкладываем: ответ встаёт рядом с родителем.
+            self.parent = self.parent.parent
+        super().save(*args, **kwargs)
+        if adding:
+            prefix = self.parent.path if self.parent_id else ''
+            self.path = prefix + str(self.pk).zfill(COMMENT_PATH_WIDTH)
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
+
+    @property
+    def depth(self):
+        return max(len(self.path) // COMMENT_PATH_WIDTH - 1, 0)
+
+    def subtree(self):
+        """Комментарий со всеми ответами в порядке показа."""
+        return Comment.objects.filter(
+            post_id=self.post_id,
+            path__gte=self.path,
+            path__lt=self.path + '~',
+        ).order_by('path')
+
+
+def path_ids(path):
+    """id комментариев, из которых состоит путь."""
+    return [int(path[start:start + COMMENT_PATH_WIDTH])
+            for start in range(0, len(path), COMMENT_PATH_WIDTH)]
 
 
 class Follow(models.Model):
@@ -104,3 +189,64 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=['user', 'author'],
                                     name='user_author')
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+
+class FeedItem(models.Model):
+    """Строка материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_items'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date', '-id']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='user_post')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='feed_user_pub_date_idx')
+        ]
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0)
+    following_count = models.PositiveIntegerField(
+        'Число подписок', default=0)
+    feed_pull = models.BooleanField(
+        'Посты подмешиваются в ленты при чтении', default=False)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+
+class StoredImage(models.Model):
+    """Сколько постов ссылается на файл картинки в хранилище."""
+    name = models.CharField('Путь к файлу', max_length=100, unique=True)
+    refcount = models.PositiveIntegerField('Число ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
@@ -0,0 +1,211 @@
+import base64
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+POST_COUNT = 10
+COMMENT_COUNT = 20
+
+# Точнее считать нет смысла: столько строк всё равно никто не пролистает.
+COUNT_LIMIT = 10000
+
+PAGE_MODE = 'page'
+CURSOR_MODE = 'cursor'
+
+
+def encode_cursor(obj, date_field='pub_date', id_field='pk'):
+    raw = f'{getattr(obj, date_field).isoformat()}|{getattr(obj, id_field)}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает пару (дата, pk) или None для битого курсора."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        date, pk = raw.split('|')
+        return parse_datetime(date), int(pk)
+    except (ValueError, TypeError, UnicodeError):
+        return None
+
+
+class CursorPage(Sequence):
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous,
+                 number=1):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.number = number
+        self.next_cursor = self.previous_cursor = ''
+        if object_list:
+            self.next_cursor = paginator.cursor(object_list[-1])
+            self.previous_cursor = paginator.cursor(object_list[0])
+
+    def __repr__(self):
+        return f'<CursorPage {self.number}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset-пагинация по (date_field, id_field) без COUNT и OFFSET.
+
+    По умолчанию страницы идут от новых к старым; reverse=False — от
+    старых к новым.
+    """
+
+    def __init__(self, object_list, per_page, date_field='pub_date',
+                 id_field='pk', reverse=True):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.date_field = date_field
+        self.id_field = id_field
+        self.reverse = reverse
+
+    def cursor(self, obj):
+        return encode_cursor(obj, self.date_field, self.id_field)
+
+    def _newer(self, cursor):
+        date, pk = cursor
+        return (Q(**{f'{self.date_field}__gt': date})
+                | Q(**{self.date_field: date, f'{self.id_field}__gt': pk}))
+
+    def _older(self, cursor):
+        date, pk = cursor
+        return (Q(**{f'{self.date_field}__lt': date})
+                | Q(**{self.date_field: date, f'{self.id_field}__lt': pk}))
+
+    def _following(self, cursor, forward=True):
+        """Строки после cursor в порядке страниц (или до него)."""
+        if self.reverse == forward:
+            return self._older(cursor)
+        return self._newer(cursor)
+
+    def _ordering(self, forward=True):
+        prefix = '-' if self.reverse == forward else ''
+        return f'{prefix}{self.date_field}', f'{prefix}{self.id_field}'
+
+    def get_page(self, after=None, before=None):
+        before_cursor = decode_cursor(before) if before else None
+        if before_cursor and before_cursor[0]:
+            items = list(
+                self.object_list
+                .filter(self._following(before_cursor, forward=False))
+                .order_by(*self._ordering(forward=False))[:self.per_page + 1]
+            )
+            has_previous = len(items) > self.per_page
+            items = items[:self.per_page][::-1]
+            return CursorPage(items, self, True, has_previous, f'b{before}')
+        after_cursor = decode_cursor(after) if after else None
+        queryset = self.object_list
+        number = 1
+        if after_cursor and after_cursor[0]:
+            queryset = queryset.filter(self._following(after_cursor))
+            number = f'a{after}'
+        items = list(
+            queryset.order_by(*self._ordering())[:self.per_page + 1])
+        has_next = len(items) > self.per_page
+        return CursorPage(items[:self.per_page], self, has_next,
+                          number != 1, number)
+
+
+class PathPaginator:
+    """Keyset-пагинация по строковому ключу, например пути комментария.
+
+    Страница — один диапазонный запрос по индексу с этим ключом.
+    """
+
+    def __init__(self, object_list, per_page, field='path'):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.field = field
+
+    def cursor(self, obj):
+        return getattr(obj, self.field)
+
+    def get_page(self, after=None):
+        queryset = self.object_list
+        if after:
+            queryset = queryset.filter(**{f'{self.field}__gt': after})
+        items = list(queryset.order_by(self.field)[:self.per_page + 1])
+        has_next = len(items) > self.per_page
+        return CursorPage(items[:self.per_page], self, has_next,
+                          bool(after), f'a{after}' if after else 1)
+
+
+def estimate_rows(model, using='default'):
+    """Оценка числа строк таблицы из статистики СУБД или None.
+
+    В SQLite статистика появляется после ANALYZE (или PRAGMA optimize).
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass'
+    elif connection.vendor == 'sqlite':
+        # Первое число в stat — строк в таблице (или в её индексе).
+        sql = ('SELECT CAST(stat AS INTEGER) FROM sqlite_stat1 '
+               'WHERE tbl = %s LIMIT 1')
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        # Нет sqlite_stat1: ANALYZE ещё ни разу не запускали.
+        return None
+    return row[0] if row else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator без точного COUNT(*) по большим таблицам.
+
+    Для всей таблицы число строк берётся из статистики СУБД, если
+    строк там больше COUNT_LIMIT. С фильтрами считаем не дальше
+    COUNT_LIMIT: COUNT по подзапросу с LIMIT останавливается на нём.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_rows(queryset.model, queryset.db)
+            if estimate is not None and estimate > COUNT_LIMIT:
+                return estimate
+        return queryset.order_by()[:COUNT_LIMIT].count()
+
+
+def get_pagination_mode(view_name):
+    modes = getattr(settings, 'PAGINATION_MODE', {})
+    return modes.get(view_name, PAGE_MODE)
+
+
+def paginate(request, queryset, view_name, per_page=POST_COUNT, **keys):
+    if get_pagination_mode(view_name) == CURSOR_MODE:
+        return CursorPaginator(queryset, per_page, **keys).get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    return Paginator(queryset, per_page).get_page(request.GET.get('page'))
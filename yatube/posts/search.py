@@ -0,0 +1,113 @@
+import re
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+
+# Длинные запросы режем: каждое слово — ещё один проход по индексу.
+MAX_WORDS = 8
+# Дальше сотой страницы поиск не листают, а COUNT по всем совпадениям
+# частого слова стоит столько же, сколько сам LIKE.
+MAX_RESULTS = 1000
+SNIPPET_WORDS = 24
+
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+WORD_RE = re.compile(r'\w+')
+
+
+def fts_query(text):
+    """Превращает ввод пользователя в безопасный запрос MATCH.
+
+    Каждое слово берётся в кавычки и ищется по префиксу, поэтому
+    операторы FTS5 во вводе не работают и не ломают запрос.
+    """
+    words = WORD_RE.findall(text)[:MAX_WORDS]
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def highlight(snippet):
+    """Экранирует фрагмент и превращает маркеры FTS5 в <mark>."""
+    return mark_safe(
+        escape(snippet)
+        .replace(HIGHLIGHT_START, '<mark>')
+        .replace(HIGHLIGHT_END, '</mark>')
+    )
+
+
+class SearchResults:
+    """Найденные посты в порядке релевантности (bm25).
+
+    Поддерживает ровно то, что нужно Paginator: count() и срезы.
+    Срез — один запрос к индексу за id и фрагментами текста и один
+    запрос за самими постами.
+    """
+
+    def __init__(self, match):
+        self.match = match
+
+    def count(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM (SELECT 1 FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s LIMIT %s)',
+                [self.match, MAX_RESULTS],
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self[:MAX_RESULTS])
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start = key.start or 0
+        stop = MAX_RESULTS if key.stop is None else key.stop
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, snippet({FTS_TABLE}, 0, char(2), char(3), '
+                f"'…', %s) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                f'ORDER BY rank LIMIT %s OFFSET %s',
+                [SNIPPET_WORDS, self.match, max(stop - start, 0), start],
+            )
+            rows = cursor.fetchall()
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for pk, _ in rows])
+        results = []
+        for pk, snippet in rows:
+            if pk in posts:
+                posts[pk].snippet = highlight(snippet)
+                results.append(posts[pk])
+        return results
+
+
+def search_posts(text):
+    """Посты по запросу text: по индексу FTS5 или, без него, через LIKE."""
+    if not is_available():
+        words = WORD_RE.findall(text)[:MAX_WORDS]
+        posts = Post.objects.select_related('author', 'group')
+        for word in words:
+            posts = posts.filter(text__icontains=word)
+        return posts if words else posts.none()
+    match = fts_query(text)
+    if not match:
+        return Post.objects.none()
+    return SearchResults(match)
+
+
+def search_ids_sql(text):
+    """Подзапрос с id найденных постов для фильтра pk__in в админке."""
+    return (f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [fts_query(text)])
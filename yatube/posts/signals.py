@@ -0,0 +1,142 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from .cache_versions import USER_DISPLAY_FIELDS, bump_versions, post_scopes
+from .counters import (bump_comments_count, bump_image_refcount,
+                       bump_replies_count, bump_user_stats)
+from .background import run_after_commit
+from .feed import (backfill_author_followers, backfill_feed, fan_out_post,
+                   prune_feed, start_pulling, stop_pulling)
+from .models import (COMMENT_PATH_WIDTH, Comment, Follow, Group, Post, User,
+                     UserStats)
+from .thumbnails import enqueue_thumbnail
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def push_post_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        bump_user_stats(instance.author_id, 'posts_count', 1)
+        fan_out_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def decrement_posts_count(sender, instance, **kwargs):
+    bump_user_stats(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def increment_comments_count(sender, instance, created, **kwargs):
+    if created:
+        bump_comments_count(instance.post_id, 1)
+        if instance.parent_id:
+            # Путь самого ответа ещё не записан: берём путь родителя.
+            bump_replies_count(instance.parent.path, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comments_count(sender, instance, **kwargs):
+    bump_comments_count(instance.post_id, -1)
+    bump_replies_count(instance.path[:-COMMENT_PATH_WIDTH], -1)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_follower_feed(sender, instance, created, **kwargs):
+    if created:
+        bump_user_stats(instance.author_id, 'followers_count', 1)
+        bump_user_stats(instance.user_id, 'following_count', 1)
+        start_pulling(instance.author_id)
+        backfill_feed(instance.user_id, instance.author_id)
+        bump_versions(f'follows:{instance.author_id}',
+                      f'follows:{instance.user_id}')
+
+
+@receiver(post_delete, sender=Follow)
+def prune_follower_feed(sender, instance, **kwargs):
+    bump_user_stats(instance.author_id, 'followers_count', -1)
+    bump_user_stats(instance.user_id, 'following_count', -1)
+    prune_feed(instance.user_id, instance.author_id)
+    if stop_pulling(instance.author_id):
+        run_after_commit(backfill_author_followers, instance.author_id)
+    bump_versions(f'follows:{instance.author_id}',
+                  f'follows:{instance.user_id}')
+
+
+@receiver(pre_save, sender=Post)
+def track_post_edit(sender, instance, **kwargs):
+    instance._old_group_id = instance._old_image = None
+    if instance.pk:
+        instance.revision += 1
+        instance._old_group_id, instance._old_image = Post.objects.filter(
+            pk=instance.pk).values_list('group_id', 'image').first() or (
+            None, None)
+
+
+@receiver(post_save, sender=Post)
+def update_image_refcounts(sender, instance, **kwargs):
+    if instance.image.name != instance._old_image:
+        bump_image_refcount(instance.image.name, 1)
+        bump_image_refcount(instance._old_image, -1)
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    bump_image_refcount(instance.image.name, -1)
+
+
+@receiver(post_save, sender=Post)
+def pregenerate_post_thumbnail(sender, instance, **kwargs):
+    if instance.image and instance.image.name != instance._old_image:
+        enqueue_thumbnail(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    bump_versions(f'post:{instance.pk}', *post_scopes(
+        instance.author_id,
+        instance.group_id,
+        getattr(instance, '_old_group_id', None),
+    ))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_commented_post_pages(sender, instance, **kwargs):
+    post = Post.objects.filter(pk=instance.post_id).values_list(
+        'author_id', 'group_id').first()
+    if post:
+        bump_versions(f'post:{instance.post_id}', *post_scopes(*post))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, **kwargs):
+    bump_versions('index', f'group:{instance.pk}')
+
+
+@receiver(pre_delete, sender=Group)
+def invalidate_group_authors(sender, instance, **kwargs):
+    authors = instance.posts.order_by().values_list(
+        'author_id', flat=True).distinct()
+    bump_versions(*(f'profile:{pk}' for pk in authors))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_pages(sender, instance, created, update_fields,
+                          **kwargs):
+    if created or (update_fields
+                   and not USER_DISPLAY_FIELDS & set(update_fields)):
+        return
+    groups = instance.posts.exclude(group=None).order_by().values_list(
+        'group_id', flat=True).distinct()
+    commented = instance.comments.order_by().values_list(
+        'post_id', flat=True).distinct()
+    bump_versions(*post_scopes(instance.pk, *groups),
+                  *(f'post:{pk}' for pk in commented))
@@ -0,0 +1,76 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..paginator import COUNT_LIMIT, EstimatedCountPaginator
+
+User = get_user_model()
+
+
+class PostAdminTests(TestCase):
+    """Список постов в админке не зависит от размера таблиц."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'posts_admin', 'admin@example.com', 'password')
+        Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'group-{i}', description='')
+            for i in range(30))
+        cls.groups = list(Group.objects.all())
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:posts_post_changelist')
+
+    def create_posts(self, count):
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=self.admin,
+                 group=self.groups[i % len(self.groups)])
+            for i in range(count))
+
+    def get_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.create_posts(5)
+        _, few = self.get_queries()
+        self.create_posts(60)
+        _, many = self.get_queries()
+        self.assertEqual(few, many)
+
+    def test_group_column_does_not_render_every_group(self):
+        self.create_posts(1)
+        response, _ = self.get_queries()
+        self.assertNotContains(response, 'Группа 1</option>')
+        self.assertContains(response, 'admin-autocomplete')
+
+    def test_count_is_limited_with_filters(self):
+        self.create_posts(15)
+        posts = Post.objects.filter(group__in=self.groups)
+        self.assertEqual(EstimatedCountPaginator(posts, 10).count, 15)
+        with mock.patch('posts.paginator.COUNT_LIMIT', 12):
+            self.assertEqual(EstimatedCountPaginator(posts, 10).count, 12)
+
+    def test_count_uses_table_statistics(self):
+        self.create_posts(3)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            cursor.execute(
+                "UPDATE sqlite_stat1 SET stat = %s WHERE tbl = 'posts_post'",
+                [f'{COUNT_LIMIT * 100} 1'])
+        paginator = EstimatedCountPaginator(Post.objects.all(), 10)
+        self.assertEqual(paginator.count, COUNT_LIMIT * 100)
+        filtered = EstimatedCountPaginator(
+            Post.objects.filter(author=self.admin), 10)
+        self.assertEqual(filtered.count, 3)
@@ -0,0 +1,169 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..counters import reconcile_comment_threads
+from ..models import COMMENT_MAX_DEPTH, Comment, Post
+from ..paginator import COMMENT_COUNT
+
+User = get_user_model()
+
+FRAGMENT_RE = re.compile(r'data-fragment="([^"]+)"')
+
+
+@override_settings(QUERY_BUDGET_CHECK=True)
+class CommentPaginationTests(TestCase):
+    """Комментарии на странице поста идут порциями по курсору."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='comments_author')
+        cls.post = Post.objects.create(text='Вирусный пост', author=cls.author)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.author, text=f'Комментарий {i}')
+            for i in range(COMMENT_COUNT * 2 + 5))
+        # bulk_create не вызывает save(): пути заполняет сверка, как
+        # после импорта.
+        reconcile_comment_threads()
+        cls.texts = list(Comment.objects.order_by('path').values_list(
+            'text', flat=True))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.url = reverse('posts:post_detail', args=[self.post.pk])
+
+    def texts_in(self, response):
+        return [comment.text for comment in response.context['comments']]
+
+    def test_first_page_is_bounded(self):
+        response = self.client.get(self.url)
+        self.assertEqual(self.texts_in(response), self.texts[:COMMENT_COUNT])
+        self.assertNotContains(response, self.texts[COMMENT_COUNT] + '\n')
+        self.assertContains(response, 'Показать ещё')
+
+    def test_fragments_load_all_comments_once(self):
+        response = self.client.get(self.url)
+        seen = self.texts_in(response)
+        fragment = FRAGMENT_RE.search(response.content.decode()).group(1)
+        while fragment:
+            response = self.client.get(fragment.replace('&amp;', '&'))
+            self.assertEqual(response.status_code, 200)
+            self.assertTemplateNotUsed(response, 'base.html')
+            seen += self.texts_in(response)
+            match = FRAGMENT_RE.search(response.content.decode())
+            fragment = match and match.group(1)
+        self.assertEqual(seen, self.texts)
+
+    def test_fallback_link_without_javascript(self):
+        first = self.client.get(self.url).context['comments']
+        response = self.client.get(self.url, {'after': first.next_cursor})
+        self.assertEqual(self.texts_in(response),
+                         self.texts[COMMENT_COUNT:COMMENT_COUNT * 2])
+
+    def test_fragment_is_cached_until_new_comment(self):
+        url = reverse('posts:comments', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Comment.objects.create(post=self.post, author=self.author, text='Ещё')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_unknown_post(self):
+        response = self.client.get(reverse('posts:comments', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+
+class CommentThreadTests(TestCase):
+    """Ответы на комментарии: пути, лимит глубины и счётчики веток."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='thread_author')
+        self.post = Post.objects.create(
+            text='Спорный пост', author=self.author)
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def reply(self, parent=None, text='Ответ', post=None):
+        return Comment.objects.create(
+            post=post or self.post, author=self.author, text=text,
+            parent=parent)
+
+    def refresh(self, *comments):
+        return [Comment.objects.get(pk=comment.pk) for comment in comments]
+
+    def test_paths_and_subtree_order(self):
+        first = self.reply(text='Первый')
+        second = self.reply(text='Второй')
+        answer = self.reply(first, text='Ответ первому')
+        nested = self.reply(answer, text='Ответ на ответ')
+        self.assertTrue(nested.path.startswith(answer.path))
+        self.assertEqual(nested.depth, 2)
+        with self.assertNumQueries(1):
+            texts = [comment.text for comment in first.subtree()]
+        self.assertEqual(texts, ['Первый', 'Ответ первому', 'Ответ на ответ'])
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        self.assertEqual(
+            [comment.pk for comment in response.context['comments']],
+            [first.pk, answer.pk, nested.pk, second.pk])
+
+    def test_depth_limit_flattens_replies(self):
+        comment = self.reply()
+        for _ in range(COMMENT_MAX_DEPTH + 2):
+            comment = self.reply(comment)
+        self.assertEqual(comment.depth, COMMENT_MAX_DEPTH - 1)
+        self.assertLessEqual(
+            len(comment.path), Comment._meta.get_field('path').max_length)
+
+    def test_replies_count_covers_whole_subtree(self):
+        root = self.reply()
+        answer = self.reply(root)
+        nested = self.reply(answer)
+        root, answer = self.refresh(root, answer)
+        self.assertEqual((root.replies_count, answer.replies_count), (2, 1))
+        nested.delete()
+        root, answer = self.refresh(root, answer)
+        self.assertEqual((root.replies_count, answer.replies_count), (1, 0))
+        answer.delete()
+        self.assertEqual(self.refresh(root)[0].replies_count, 0)
+
+    def test_reply_through_form(self):
+        root = self.reply()
+        other = self.reply(post=Post.objects.create(
+            text='Другой пост', author=self.author))
+        url = reverse('posts:add_comment', args=[self.post.pk])
+        self.client.post(url, {'text': 'По делу', 'parent': root.pk})
+        self.client.post(url, {'text': 'Не туда', 'parent': other.pk})
+        self.assertEqual(Comment.objects.get(text='По делу').parent, root)
+        self.assertIsNone(Comment.objects.get(text='Не туда').parent)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]),
+            {'reply_to': root.pk})
+        self.assertContains(response, 'Ответ на комментарий')
+
+    def test_thread_fragment(self):
+        root = self.reply(text='Ветка')
+        self.reply(root, text='Внутри ветки')
+        self.reply(text='Соседняя ветка')
+        url = reverse('posts:comments', args=[self.post.pk])
+        response = self.client.get(url, {'thread': root.pk})
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['Ветка', 'Внутри ветки'])
+        response = self.client.get(url, {'thread': 0})
+        self.assertEqual(response.status_code, 404)
+
+    def test_reconcile_rebuilds_threads(self):
+        root = self.reply()
+        self.reply(self.reply(root))
+        Comment.objects.update(replies_count=0)
+        reconcile_comment_threads()
+        self.assertEqual(self.refresh(root)[0].replies_count, 2)
@@ -0,0 +1,146 @@
+import datetime
+import json
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..importer import Importer, read_ndjson
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    """Выгрузка в NDJSON командой и через эндпоинт для staff."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='leo')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Классика', slug='classic', description='')
+        self.old = Post.objects.create(
+            text='Анна Каренина', author=self.author, group=self.group)
+        Post.objects.filter(pk=self.old.pk).update(
+            pub_date=timezone.make_aware(datetime.datetime(2001, 2, 3)))
+        self.new = Post.objects.create(text='Дневник', author=self.reader)
+        Comment.objects.create(
+            post=self.old, author=self.reader, text='Прочитал')
+        Comment.objects.create(post=self.new, author=self.author, text='Ну')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.staff = Client()
+        self.staff.force_login(User.objects.create_user(
+            username='staff', is_staff=True))
+
+    def export(self, **options):
+        out = StringIO()
+        call_command('export_yatube', stdout=out, **options)
+        return [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def summary(self, record):
+        return {'user': record.get('username'), 'group': record.get('slug'),
+                'post': record.get('id'), 'comment': record.get('text'),
+                'follow': record.get('author')}[record['type']]
+
+    def test_export_all(self):
+        records = self.export()
+        self.assertEqual([record['type'] for record in records],
+                         ['user', 'user', 'group', 'post', 'post',
+                          'comment', 'comment', 'follow'])
+        self.assertEqual(records[2], {
+            'type': 'group', 'title': 'Классика', 'slug': 'classic',
+            'description': ''})
+        self.assertEqual(records[3], {
+            'type': 'post', 'id': self.old.pk, 'text': 'Анна Каренина',
+            'author': 'leo', 'group': 'classic',
+            'pub_date': '2001-02-03T00:00:00+00:00',
+        })
+        self.assertEqual(records[-1],
+                         {'type': 'follow', 'user': 'reader', 'author': 'leo'})
+
+    def test_export_filters(self):
+        for options, expected in (
+            ({'author': 'leo'},
+             ['leo', 'reader', 'classic', self.old.pk, 'Прочитал', 'leo']),
+            ({'since': '2001-02-04', 'types': 'user,group,post'},
+             ['reader', self.new.pk]),
+            ({'group': 'classic', 'types': 'post'}, [self.old.pk]),
+            ({'since': '2001-02-04', 'types': 'post,comment'},
+             [self.new.pk, 'Ну']),
+            ({'until': '2001-02-03', 'types': 'post'}, [self.old.pk]),
+        ):
+            with self.subTest(options=options):
+                records = self.export(**options)
+                self.assertEqual([self.summary(record) for record in records],
+                                 expected)
+
+    def test_export_round_trips_through_import(self):
+        dump = ''.join(
+            json.dumps(record) + '\n' for record in self.export())
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        Importer().run(read_ndjson(StringIO(dump)))
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.author).exists())
+        self.assertEqual(Post.objects.get(pk=self.old.pk).pub_date.year, 2001)
+
+    def test_export_imports_into_empty_database(self):
+        User.objects.filter(username='leo').update(first_name='Лев')
+        dump = ''.join(
+            json.dumps(record) + '\n' for record in self.export())
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        errors = []
+        Importer(on_error=lambda line, message: errors.append(
+            message)).run(read_ndjson(StringIO(dump)))
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            list(User.objects.order_by('pk').values_list(
+                'username', 'first_name')),
+            [('leo', 'Лев'), ('reader', '')])
+        self.assertEqual(Post.objects.get(pk=self.old.pk).group.slug,
+                         'classic')
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_round_trip_keeps_comment_threads(self):
+        root = Comment.objects.get(text='Прочитал')
+        answer = Comment.objects.create(
+            post=self.old, author=self.author, text='И как?', parent=root)
+        Comment.objects.create(
+            post=self.old, author=self.reader, text='Долго', parent=answer)
+        records = self.export(types='comment', author='leo')
+        self.assertEqual(records[1]['parent'], root.pk)
+        self.assertNotIn('parent', records[0])
+        comments = Comment.objects.filter(post=self.old).order_by(
+            'path').values_list('pk', 'parent_id', 'path', 'replies_count')
+        threads = list(comments)
+        Comment.objects.all().delete()
+        Importer().run(iter(records))
+        self.assertEqual(list(comments), threads)
+
+    def test_endpoint_streams_ndjson_for_staff(self):
+        url = reverse('posts:export')
+        response = self.staff.get(url, {'author': 'leo', 'types': 'post'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'],
+                         'application/x-ndjson; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines],
+                         [self.old.pk])
+
+    def test_endpoint_rejects_bad_filters_and_non_staff(self):
+        url = reverse('posts:export')
+        self.assertEqual(
+            self.staff.get(url, {'since': 'вчера'}).status_code, 400)
+        self.assertEqual(
+            self.staff.get(url, {'types': 'poem'}).status_code, 400)
+        reader = Client()
+        reader.force_login(self.reader)
+        self.assertEqual(reader.get(url).status_code, 302)
@@ -1,10 +1,13 @@
+import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from ..models import Post, Group, User
 
@@ -97,3 +100,71 @@ class PostFormTests(TestCase):
             follow=True)
         self.assertRedirects(response, ('/auth/login/?next=/create/'))
         self.assertEqual(Post.objects.count(), post)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTests(TestCase):
+    """Загрузка картинок через BoundedImageUploadHandler."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    @staticmethod
+    def image_file(size, image_format='JPEG', name='image.jpg'):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'white').save(buffer, image_format)
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    @staticmethod
+    def truncated_png(size):
+        buffer = BytesIO()
+        Image.effect_noise(size, 64).save(buffer, 'PNG')
+        content = buffer.getvalue()
+        return SimpleUploadedFile('image.png', content[:len(content) // 2])
+
+    def create(self, image):
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': image},
+        )
+
+    @override_settings(UPLOAD_IMAGE_MAX_SIDE=100)
+    def test_large_image_is_downscaled(self):
+        response = self.create(self.image_file((400, 200)))
+        self.assertEqual(response.status_code, 302)
+        post = Post.objects.get(author=self.user)
+        self.assertEqual((post.image.width, post.image.height), (100, 50))
+
+    def test_small_image_is_kept(self):
+        self.create(self.image_file((40, 20), 'PNG', 'image.png'))
+        post = Post.objects.get(author=self.user)
+        self.assertEqual((post.image.width, post.image.height), (40, 20))
+
+    def test_invalid_uploads_are_rejected(self):
+        uploads = {
+            'байты': (self.image_file((200, 200)),
+                      {'UPLOAD_IMAGE_MAX_BYTES': 100}),
+            'пиксели': (self.image_file((200, 200)),
+                        {'UPLOAD_IMAGE_MAX_PIXELS': 100}),
+            'не картинка': (SimpleUploadedFile('text.jpg', b'not image'),
+                            {}),
+            'формат': (self.image_file((20, 20), 'BMP', 'image.bmp'), {}),
+            'обрезанная': (self.truncated_png((3000, 1000)), {}),
+        }
+        for name, (image, limits) in uploads.items():
+            with self.subTest(upload=name), override_settings(**limits):
+                response = self.create(image)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.context['form'].errors['image'])
+        self.assertFalse(Post.objects.filter(author=self.user).exists())
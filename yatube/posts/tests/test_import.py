@@ -0,0 +1,167 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..importer import Importer
+from ..models import COMMENT_MAX_DEPTH, Comment, FeedItem, Follow, Group, Post
+from ..search import search_posts
+
+User = get_user_model()
+
+RECORDS = [
+    {'type': 'user', 'username': 'leo', 'first_name': 'Лев'},
+    {'type': 'group', 'title': 'Классика', 'slug': 'classic'},
+    {'type': 'post', 'id': 500, 'text': 'Анна Каренина', 'author': 'leo',
+     'group': 'classic', 'pub_date': '2001-02-03T04:05:06'},
+    {'type': 'post', 'id': 501, 'text': 'Война и мир', 'author': 'leo'},
+    {'type': 'comment', 'post': 500, 'text': 'Прочитал', 'author': 'reader'},
+    {'type': 'comment', 'post': 999, 'text': 'Нет поста', 'author': 'leo'},
+    {'type': 'post', 'text': 'Без автора', 'author': 'nobody'},
+    {'type': 'poem', 'text': 'Неизвестный тип'},
+]
+
+
+class ImportTests(TestCase):
+    """Команда import_yatube пишет пачками и восстанавливает производные."""
+
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader')
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(content)
+        return path
+
+    def run_import(self, path, **options):
+        out, err = StringIO(), StringIO()
+        call_command('import_yatube', path, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_ndjson_import(self):
+        Follow.objects.create(
+            user=self.reader, author=User.objects.create_user('leo'))
+        path = self.write('dump.ndjson', '\n'.join(
+            json.dumps(record, ensure_ascii=False) for record in RECORDS))
+        out, err = self.run_import(path, batch_size=2)
+        self.assertIn(
+            'постов 2, комментариев 1, подписок 0; пропущено 3', out)
+        self.assertIn('строк/с', out)
+        self.assertIn("Неизвестный пост '999'", err)
+        self.assertIn("Неизвестный автор 'nobody'", err)
+
+        post = Post.objects.get(pk=500)
+        self.assertEqual(post.group, Group.objects.get(slug='classic'))
+        self.assertEqual(post.pub_date.year, 2001)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.author.stats.posts_count, 2)
+        self.assertFalse(post.author.has_usable_password())
+        self.assertEqual(
+            FeedItem.objects.filter(user=self.reader).count(), 2)
+        self.assertEqual([p.pk for p in search_posts('каренина')], [500])
+
+    def test_csv_import_and_rerun(self):
+        path = self.write('dump.csv', (
+            'type,username,title,slug,id,text,author,group,post\n'
+            'user,leo,,,,,,,\n'
+            'group,,Классика,classic,,,,,\n'
+            'post,,,,500,Анна Каренина,leo,classic,\n'
+            'comment,,,,,Прочитал,reader,,500\n'
+        ))
+        self.run_import(path)
+        self.assertEqual(Post.objects.get(pk=500).group.slug, 'classic')
+        self.assertEqual(Comment.objects.get().post_id, 500)
+
+        out, err = self.run_import(path)
+        self.assertIn('Пост 500 уже есть', err)
+        self.assertEqual(User.objects.filter(username='leo').count(), 1)
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_rerun_counts_only_new_rows(self):
+        records = [
+            {'type': 'user', 'username': 'leo'},
+            {'type': 'user', 'username': 'leo'},
+            {'type': 'group', 'title': 'Классика', 'slug': 'classic'},
+            {'type': 'follow', 'user': 'reader', 'author': 'leo'},
+        ]
+        counts = Importer().run(iter(records))
+        self.assertEqual(
+            (counts['user'], counts['group'], counts['follow']), (1, 1, 1))
+        counts = Importer().run(iter(records))
+        self.assertEqual(
+            (counts['user'], counts['group'], counts['follow']), (0, 0, 0))
+        self.assertEqual(
+            User.objects.get(pk=self.reader.pk).stats.following_count, 1)
+
+    def test_only_touched_rows_are_reconciled(self):
+        other = User.objects.create_user(username='other')
+        post = Post.objects.create(text='Чужой пост', author=other)
+        Follow.objects.create(user=self.reader, author=other)
+        Post.objects.filter(pk=post.pk).update(comments_count=7)
+        records = [
+            {'type': 'user', 'username': 'leo'},
+            {'type': 'post', 'id': 500, 'text': 'Анна', 'author': 'leo'},
+            {'type': 'post', 'text': 'Без id', 'author': 'leo'},
+            {'type': 'follow', 'user': 'reader', 'author': 'leo'},
+        ]
+        Importer().run(iter(records))
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 7)
+        self.assertEqual(
+            FeedItem.objects.filter(user=self.reader).count(), 3)
+        leo = User.objects.get(username='leo')
+        self.assertEqual(leo.stats.posts_count, 2)
+        self.assertEqual(leo.stats.followers_count, 1)
+
+    def test_malformed_lines_are_skipped(self):
+        path = self.write('dump.ndjson', '\n'.join([
+            '{"type": "user", "username": "leo"}',
+            '{"type": "post", "id": 500, "text": "Анна',
+            '[1, 2]',
+            '{"type": "post", "id": 501, "text": "Война", "author": "leo"}',
+        ]))
+        out, err = self.run_import(path, batch_size=1)
+        self.assertIn('постов 1', out)
+        self.assertIn('пропущено 2', out)
+        self.assertIn('Строка 2: Не JSON', err)
+        self.assertIn('Строка 3: Строка должна быть объектом', err)
+
+    def test_interrupted_import_reconciles_written_batches(self):
+        def records():
+            yield {'type': 'user', 'username': 'leo'}
+            yield {'type': 'post', 'id': 500, 'text': 'Анна',
+                   'author': 'leo'}
+            raise OSError('обрыв потока')
+
+        with self.assertRaises(OSError):
+            Importer(batch_size=1).run(records())
+        post = Post.objects.get(pk=500)
+        self.assertEqual(post.author.stats.posts_count, 1)
+
+    def test_deep_replies_are_flattened(self):
+        post = Post.objects.create(text='Пост', author=self.reader)
+        records = [{'type': 'comment', 'id': 700, 'post': post.pk,
+                    'text': 'Корень', 'author': 'reader'}]
+        records += [{'type': 'comment', 'id': 701 + i, 'parent': 700 + i,
+                     'post': post.pk, 'text': f'Ответ {i}',
+                     'author': 'reader'}
+                    for i in range(COMMENT_MAX_DEPTH + 1)]
+        records.append({'type': 'comment', 'parent': 999, 'post': post.pk,
+                        'text': 'Сирота', 'author': 'reader'})
+        errors = []
+        Importer(batch_size=3, on_error=lambda line, message: errors.append(
+            message)).run(iter(records))
+        self.assertEqual(errors, ["Неизвестный родитель 999 у комментария"])
+        depths = [comment.depth for comment in
+                  Comment.objects.order_by('pk')]
+        self.assertEqual(depths, [0, 1, 2, 3, 4, 4, 4])
+        self.assertEqual(Comment.objects.get(pk=700).replies_count,
+                         COMMENT_MAX_DEPTH + 1)
@@ -0,0 +1,100 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..models import Post, StoredImage
+from ..thumbnails import generate_thumbnails, thumbnail_cache_key
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedMediaTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='media_author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name='small.gif'):
+        return Post.objects.create(
+            text='Тестовый текст',
+            author=self.author,
+            image=SimpleUploadedFile(name, SMALL_GIF, 'image/gif'),
+        )
+
+    def refcount(self, name):
+        return StoredImage.objects.get(name=name).refcount
+
+    def collect(self):
+        out = StringIO()
+        call_command('collect_media', grace=0, stdout=out)
+        return out.getvalue()
+
+    def test_identical_images_share_one_file(self):
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.startswith('posts/'))
+        self.assertEqual(self.refcount(first.image.name), 2)
+        self.assertEqual(
+            generate_thumbnails(first.image.name),
+            generate_thumbnails(second.image.name),
+        )
+
+    def test_edit_and_delete_release_references(self):
+        post = self.create_post()
+        name = post.image.name
+        post.image = ''
+        post.save()
+        self.assertEqual(self.refcount(name), 0)
+        post.image = name
+        post.save()
+        self.assertEqual(self.refcount(name), 1)
+        post.delete()
+        self.assertEqual(self.refcount(name), 0)
+
+    def test_collect_keeps_referenced_images(self):
+        kept = self.create_post()
+        self.create_post().delete()
+        self.assertIn('картинок: 0', self.collect())
+        self.assertTrue(kept.image.storage.exists(kept.image.name))
+
+    def test_collect_removes_unreferenced_images_and_thumbnails(self):
+        post = self.create_post()
+        name, storage = post.image.name, post.image.storage
+        thumbnail = generate_thumbnails(name)['src']
+        thumbnail = thumbnail[len(settings.MEDIA_URL):]
+        post.delete()
+        self.assertIn('картинок: 1', self.collect())
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(storage.exists(thumbnail))
+        self.assertFalse(StoredImage.objects.filter(name=name).exists())
+        self.assertIsNone(cache.get(thumbnail_cache_key(name)))
+
+    def test_collect_reconciles_refcounts_first(self):
+        post = self.create_post()
+        StoredImage.objects.update(refcount=0)
+        self.assertIn('картинок: 0', self.collect())
+        self.assertEqual(self.refcount(post.image.name), 1)
@@ -1,6 +1,9 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import User, Group, Post, Comment, Follow
+from ..models import User, Group, Post, Comment, Follow, UserStats
 
 
 class PostModelTest(TestCase):
@@ -72,3 +75,52 @@ class PostModelTest(TestCase):
         for value, expected_text in expected_texts.items():
             with self.subTest(value=value):
                 self.assertEqual(value.help_text, expected_text)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='counter_author')
+        cls.reader = User.objects.create_user(username='counter_reader')
+
+    def test_counters_follow_writes(self):
+        post = Post.objects.create(text='текст', author=self.author)
+        comment = Comment.objects.create(
+            text='комментарий', author=self.reader, post=post)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        author_stats = UserStats.objects.get(user=self.author)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1)
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        stats = UserStats.objects.get(user=self.author)
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(stats.followers_count, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 0)
+
+    def test_reconcile_counters_fixes_drift(self):
+        post = Post.objects.create(text='текст', author=self.author)
+        Comment.objects.create(
+            text='комментарий', author=self.reader, post=post)
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.update(
+            posts_count=7, followers_count=7, following_count=7)
+        Post.objects.update(comments_count=7)
+        UserStats.objects.filter(user=self.reader).delete()
+        call_command('reconcile_counters', stdout=StringIO())
+        post.refresh_from_db()
+        author_stats = UserStats.objects.get(user=self.author)
+        reader_stats = UserStats.objects.get(user=self.reader)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(author_stats.following_count, 0)
+        self.assertEqual(reader_stats.following_count, 1)
+        self.assertEqual(reader_stats.posts_count, 0)
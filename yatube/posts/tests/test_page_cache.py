@@ -0,0 +1,108 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTests(TestCase):
+    """Анонимы получают страницы из кэша и ответы 304."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='cached_author')
+        cls.reader = User.objects.create_user(username='cached_reader')
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            description='Тестовое описание',
+            slug='test-slug'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый текст', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+        self.urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_posts',
+                             kwargs={'slug': self.group.slug}),
+            'profile': reverse('posts:profile',
+                               kwargs={'username': self.author.username}),
+            'detail': reverse('posts:post_detail',
+                              kwargs={'post_id': self.post.id}),
+        }
+
+    def test_conditional_get_returns_not_modified(self):
+        for url in self.urls.values():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Cookie', response['Vary'])
+                not_modified = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(not_modified['ETag'], response['ETag'])
+                not_modified = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(not_modified.status_code, 304)
+
+    def test_repeated_request_is_served_without_rendering(self):
+        response = self.client.get(self.urls['index'])
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.urls['index'])
+        self.assertIsNone(cached.context)
+        self.assertEqual(cached.content, response.content)
+
+    def test_pages_are_keyed_by_query_string(self):
+        first = self.client.get(self.urls['index'])
+        second = self.client.get(self.urls['index'] + '?page=2')
+        self.assertNotEqual(first['ETag'], second['ETag'])
+
+    def test_changes_produce_new_etag(self):
+        changes = {
+            'index': lambda: Post.objects.create(
+                text='Новый пост', author=self.reader),
+            'group': lambda: self.group.save(),
+            'profile': lambda: Follow.objects.create(
+                user=self.reader, author=self.author),
+            'detail': lambda: Comment.objects.create(
+                text='Комментарий', author=self.reader, post=self.post),
+        }
+        for name, change in changes.items():
+            with self.subTest(page=name):
+                etag = self.client.get(self.urls[name])['ETag']
+                change()
+                response = self.client.get(
+                    self.urls[name], HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_commenter_rename_changes_post_etag(self):
+        Comment.objects.create(
+            text='Комментарий', author=self.reader, post=self.post)
+        etag = self.client.get(self.urls['detail'])['ETag']
+        self.reader.username = 'renamed_reader'
+        self.reader.save()
+        response = self.client.get(self.urls['detail'])
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertContains(response, 'renamed_reader')
+
+    def test_authorized_users_bypass_cache(self):
+        for url in self.urls.values():
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(response.has_header('ETag'))
+                self.assertIsNotNone(response.context)
+
+    def test_missing_pages_are_not_cached(self):
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'nobody'}))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.decorators import QueryBudgetExceeded, query_budget
+from ..models import Comment, Follow, Group, Post
+from ..paginator import POST_COUNT
+
+User = get_user_model()
+
+
+@override_settings(QUERY_BUDGET_CHECK=True)
+class QueryBudgetTests(TestCase):
+    """Число запросов не растёт вместе с числом постов на странице."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='budget_reader')
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            description='Тестовое описание',
+            slug='test-slug'
+        )
+        for i in range(POST_COUNT + 2):
+            author = User.objects.create_user(username=f'budget_{i}')
+            Follow.objects.create(user=cls.reader, author=author)
+            cls.post = Post.objects.create(
+                text=f'Тестовый текст {i}', author=author, group=cls.group)
+            Comment.objects.create(
+                text='Комментарий', author=author, post=cls.post)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_views_stay_within_budget(self):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'budget_0'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        ]
+        for client in (self.client, self.authorized_client):
+            for url in urls:
+                with self.subTest(url=url):
+                    self.assertEqual(client.get(url).status_code, 200)
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), POST_COUNT)
+
+    def test_budget_violation_raises(self):
+        @query_budget(0)
+        def view(request):
+            return list(Post.objects.all())
+
+        with self.assertRaises(QueryBudgetExceeded):
+            view(None)
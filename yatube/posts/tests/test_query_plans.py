@@ -0,0 +1,102 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+# Проход по материализованному подзапросу COUNT(*) таблицей не считается.
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?(?!subquery$)\w+$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class QueryPlanTests(TestCase):
+    """Запросы лент не должны сканировать таблицы и сортировать в памяти."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='plan_author')
+        cls.reader = User.objects.create_user(username='plan_reader')
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            description='Тестовое описание',
+            slug='test-slug'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(
+            text='Тестовый текст', author=cls.author, group=cls.group)
+        Comment.objects.create(
+            text='Комментарий', author=cls.reader, post=cls.post)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def assert_plans_are_indexed(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            for step in explain(sql):
+                with self.subTest(url=url, sql=sql, step=step):
+                    self.assertIsNone(FULL_SCAN.match(step))
+                    self.assertNotIn(TEMP_SORT, step)
+
+    def feed_urls(self):
+        return [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'plan_author'}),
+            reverse('posts:follow_index'),
+        ]
+
+    def test_page_mode_plans(self):
+        for url in self.feed_urls():
+            self.assert_plans_are_indexed(url)
+
+    def test_merged_follow_feed_plans(self):
+        UserStats.objects.filter(user=self.author).update(feed_pull=True)
+        self.assert_plans_are_indexed(reverse('posts:follow_index'))
+
+    def test_post_detail_plans(self):
+        self.assert_plans_are_indexed(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+
+    def test_api_comment_list_plans(self):
+        Comment.objects.create(
+            text='Ещё комментарий', author=self.author, post=self.post)
+        url = reverse('api:comment_list', kwargs={'post_id': self.post.id})
+        self.assert_plans_are_indexed(url)
+        after = self.client.get(url, {'limit': 1}).json()['next']
+        self.assert_plans_are_indexed(after)
+
+    @override_settings(PAGINATION_MODE={
+        'index': 'cursor',
+        'group_posts': 'cursor',
+        'profile': 'cursor',
+        'follow_index': 'cursor',
+    })
+    def test_cursor_mode_plans(self):
+        for url in self.feed_urls():
+            self.assert_plans_are_indexed(url)
+            self.assert_plans_are_indexed(
+                f'{url}?after={self.cursor(url)}')
+
+    def cursor(self, url):
+        return self.client.get(url).context['page_obj'].next_cursor
@@ -0,0 +1,99 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..paginator import POST_COUNT
+from ..search import fts_query, search_posts
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    """Поиск по индексу FTS5 и его синхронизация триггерами."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='search_author', first_name='Лев', last_name='Толстой')
+        self.group = Group.objects.create(
+            title='Классика',
+            description='Тестовое описание',
+            slug='classic',
+        )
+        self.post = Post.objects.create(
+            text='Все счастливые семьи похожи друг на друга',
+            author=self.author,
+            group=self.group,
+        )
+        self.client = Client()
+        self.admin_client = Client()
+        self.admin_client.force_login(User.objects.create_superuser(
+            'search_admin', 'admin@example.com', 'password'))
+
+    def found(self, query):
+        return [post.pk for post in search_posts(query)]
+
+    def test_fts_query_quotes_words(self):
+        self.assertEqual(
+            fts_query('семьи OR "NEAR(" *'), '"семьи"* "OR"* "NEAR"*')
+        self.assertEqual(fts_query('!!!'), '')
+
+    def test_search_by_text_prefix_group_and_author(self):
+        for query in ('счастливые', 'счастлив', 'СЕМЬИ', 'классика',
+                      'толстой', 'search_author'):
+            with self.subTest(query=query):
+                self.assertEqual(self.found(query), [self.post.pk])
+        self.assertEqual(self.found('несчастливая'), [])
+
+    def test_text_match_ranks_above_author_match(self):
+        other = User.objects.create_user(username='семьи')
+        by_author = Post.objects.create(text='Про другое', author=other)
+        self.assertEqual(self.found('семьи'), [self.post.pk, by_author.pk])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.post.text = 'Каждая несчастливая семья несчастлива по-своему'
+        self.post.save()
+        self.assertEqual(self.found('несчастливая'), [self.post.pk])
+        self.assertEqual(self.found('похожи'), [])
+        self.group.title = 'Романы'
+        self.group.save()
+        self.assertEqual(self.found('романы'), [self.post.pk])
+        self.author.last_name = 'Достоевский'
+        self.author.save()
+        self.assertEqual(self.found('достоевский'), [self.post.pk])
+        self.post.delete()
+        self.assertEqual(self.found('несчастливая'), [])
+
+    def test_snippet_is_highlighted_and_escaped(self):
+        Post.objects.create(text='<b>семьи</b> & дети', author=self.author)
+        snippets = [post.snippet for post in search_posts('семьи')]
+        self.assertIn('&lt;b&gt;<mark>семьи</mark>&lt;/b&gt; &amp; дети',
+                      snippets)
+
+    def test_search_page(self):
+        response = self.client.get(reverse('posts:search'), {'q': 'семьи'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+        self.assertContains(response, '<mark>семьи</mark>')
+        response = self.client.get(reverse('posts:search'))
+        self.assertIsNone(response.context['page_obj'])
+
+    def test_search_pagination_keeps_query(self):
+        Post.objects.bulk_create(
+            Post(text=f'Семьи {i}', author=self.author)
+            for i in range(POST_COUNT + 1))
+        response = self.client.get(reverse('posts:search'), {'q': 'семьи'})
+        self.assertEqual(len(response.context['page_obj']), POST_COUNT)
+        self.assertContains(response, 'href="?q=%D1%81%D0%B5%D0%BC%D1%8C%D0%B8'
+                                      '&amp;page=2"')
+        self.assertContains(response, 'class="pagination"', count=1)
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'семьи', 'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 2)
+
+    def test_admin_search_uses_index(self):
+        Post.objects.create(text='Про другое', author=self.author)
+        response = self.admin_client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'счастлив'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.post])
@@ -0,0 +1,94 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class SyndicationTests(TestCase):
+    """RSS и Atom рендерятся один раз и отдают 304, пока посты те же."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='feed_author', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Классика', slug='classic', description='Описание')
+        cls.post = Post.objects.create(
+            text='Все счастливые семьи похожи друг на друга',
+            author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.urls = {
+            'index_rss': reverse('posts:index_rss'),
+            'index_atom': reverse('posts:index_atom'),
+            'group_rss': reverse('posts:group_rss', args=['classic']),
+            'group_atom': reverse('posts:group_atom', args=['classic']),
+            'profile_rss': reverse('posts:profile_rss',
+                                   args=['feed_author']),
+            'profile_atom': reverse('posts:profile_atom',
+                                    args=['feed_author']),
+        }
+
+    def test_feeds_render(self):
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                content_type = ('application/atom+xml'
+                                if name.endswith('atom')
+                                else 'application/rss+xml')
+                self.assertTrue(
+                    response['Content-Type'].startswith(content_type))
+                self.assertContains(response, 'Все счастливые семьи')
+                self.assertContains(response, 'Лев Толстой')
+                self.assertContains(response, reverse(
+                    'posts:post_detail', args=[self.post.pk]))
+
+    def test_unknown_group_and_author(self):
+        for name, args in (('posts:group_rss', ['nope']),
+                           ('posts:profile_atom', ['nobody'])):
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name, args=args))
+                self.assertEqual(response.status_code, 404)
+
+    def test_conditional_get_until_posts_change(self):
+        url = self.urls['group_atom']
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        Post.objects.create(text='Новая запись', author=self.author,
+                            group=self.group)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новая запись')
+
+    def test_cached_feed_is_not_rendered_again(self):
+        url = self.urls['index_rss']
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'Все счастливые семьи')
+
+    def test_author_feed_ignores_follows(self):
+        url = self.urls['profile_rss']
+        etag = self.client.get(url)['ETag']
+        Follow.objects.create(
+            user=User.objects.create_user(username='reader'),
+            author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_pages_link_to_feeds(self):
+        response = self.client.get(
+            reverse('posts:group_posts', args=['classic']))
+        self.assertContains(response, self.urls['group_atom'])
+        self.assertContains(response, self.urls['group_rss'])
@@ -0,0 +1,139 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image, features
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from ..models import Post
+from ..thumbnails import (POST_THUMBNAIL_WIDTHS, generate_thumbnails,
+                          get_thumbnail_variants, iter_image_names,
+                          thumbnail_cache_key)
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPregenerationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='thumb_author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_post(self, image=None):
+        return Post.objects.create(
+            text='Тестовый текст',
+            author=self.author,
+            image=image or SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF,
+                content_type='image/gif'),
+        )
+
+    def test_new_image_is_enqueued_once(self):
+        with mock.patch('posts.signals.enqueue_thumbnail') as enqueue:
+            post = self.create_post()
+            post.text = 'Новый текст'
+            post.save()
+        enqueue.assert_called_once_with(post.image.name)
+
+    def test_command_generates_missing_thumbnails(self):
+        with mock.patch('posts.signals.enqueue_thumbnail'):
+            post = self.create_post()
+        out = StringIO()
+        call_command('pregenerate_thumbnails', workers=1, stdout=out)
+        self.assertIn('1 из 1', out.getvalue())
+        variants = generate_thumbnails(post.image.name)
+        name = variants['src'][len(settings.MEDIA_URL):]
+        self.assertIsNotNone(default.kvstore.get(
+            ImageFile(name, default.storage)))
+
+    def test_image_names_are_distinct_and_batched(self):
+        with mock.patch('posts.signals.enqueue_thumbnail'):
+            names = {self.create_post().image.name,
+                     self.create_post().image.name,
+                     self.create_post(self.image_file(20, 10)).image.name}
+        with self.assertNumQueries(3):
+            self.assertEqual(
+                list(iter_image_names(batch_size=1)), sorted(names))
+
+    def test_page_thumbnails_are_resolved_in_one_lookup(self):
+        with mock.patch('posts.signals.enqueue_thumbnail'):
+            posts = [self.create_post() for _ in range(3)]
+        names = [post.image.name for post in posts]
+        variants = {name: generate_thumbnails(name) for name in names}
+        with self.assertNumQueries(0):
+            self.assertEqual(get_thumbnail_variants(names), variants)
+        response = self.client.get(reverse('posts:index'))
+        for post_variants in variants.values():
+            self.assertContains(response, f'src="{post_variants["src"]}"')
+            self.assertContains(
+                response, f'srcset="{post_variants["srcset"]}"')
+
+    def test_missing_variants_are_queued_not_generated(self):
+        with mock.patch('posts.signals.enqueue_thumbnail'):
+            post = self.create_post()
+        with mock.patch('posts.thumbnails.enqueue_thumbnail') as enqueue, \
+                mock.patch('posts.thumbnails.generate_thumbnails') as generate:
+            response = self.client.get(reverse('posts:index'))
+            self.assertEqual(get_thumbnail_variants([post.image.name]), {})
+        generate.assert_not_called()
+        enqueue.assert_called_once_with(post.image.name)
+        self.assertContains(response, 'class="card-img my-2"')
+        self.assertNotContains(response, 'srcset=')
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_nothing_is_queued_without_workers(self):
+        with mock.patch('posts.signals.enqueue_thumbnail'):
+            post = self.create_post()
+        with mock.patch('posts.thumbnails.enqueue_thumbnail') as enqueue:
+            self.assertEqual(get_thumbnail_variants([post.image.name]), {})
+        enqueue.assert_not_called()
+        self.assertIsNone(
+            cache.get(f'{thumbnail_cache_key(post.image.name)}:queued'))
+
+    def test_variants_are_not_wider_than_source(self):
+        with mock.patch('posts.signals.enqueue_thumbnail'):
+            small = self.create_post()
+            wide = self.create_post(self.image_file(1200, 600))
+        small_variants = generate_thumbnails(small.image.name)
+        self.assertNotIn(' 1140w', small_variants['srcset'])
+        wide_variants = generate_thumbnails(wide.image.name)
+        for width in POST_THUMBNAIL_WIDTHS:
+            self.assertIn(f' {width}w', wide_variants['srcset'])
+        self.assertIn(wide_variants['src'], wide_variants['srcset'])
+        self.assertEqual(
+            bool(wide_variants['webp_srcset']), features.check('webp'))
+
+    def image_file(self, width, height):
+        buffer = BytesIO()
+        Image.new('RGB', (width, height)).save(buffer, 'JPEG')
+        return SimpleUploadedFile(
+            name='wide.jpg', content=buffer.getvalue(),
+            content_type='image/jpeg')
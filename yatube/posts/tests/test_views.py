@@ -1,15 +1,19 @@
 import shutil
 import tempfile
+from io import StringIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from core.templatetags.post_cards import post_card, prefetch_post_cards
 from ..forms import PostForm
-from ..models import Post, Group, Comment, Follow
+from ..models import Post, Group, Comment, Follow, FeedItem
 from ..views import POST_COUNT
 
 User = get_user_model()
@@ -231,14 +235,43 @@ class PostsPagesTests(TestCase):
         cache.clear()
         response = self.authorized_client.get(reverse('posts:index'))
         cache_test = response.content
-        post = Post.objects.get(id=1)
-        post.delete()
+        Post.objects.filter(id=self.post.id).update(text='Без сигналов')
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(response.content, cache_test)
         cache.clear()
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(response.content, cache_test)
 
+    def test_cache_is_invalidated_by_changes(self):
+        paths = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.post_author.username}),
+        ]
+        for change in (self.create_post, self.rename_author,
+                       self.add_comment):
+            before = [self.client.get(path).content for path in paths]
+            change()
+            for path, content in zip(paths, before):
+                with self.subTest(change=change.__name__, path=path):
+                    self.assertNotEqual(
+                        self.client.get(path).content, content)
+
+    def create_post(self):
+        Post.objects.create(
+            text='Новый пост', author=self.post_author, group=self.group)
+
+    def rename_author(self):
+        author = User.objects.get(pk=self.post_author.pk)
+        author.first_name = 'Лев'
+        author.last_name = 'Толстой'
+        author.save()
+
+    def add_comment(self):
+        Comment.objects.create(
+            text='Ещё комментарий', author=self.user, post=self.post)
+
     def test_follow_page_for_follower(self):
         self.authorized_follower.get(
             reverse('posts:profile_follow',
@@ -337,3 +370,212 @@ class PaginatorViewsTest(TestCase):
             kwargs={'username': self.post_author.username}), {'page': 2})
         second_page = Post.objects.count() % POST_COUNT
         self.assertEqual(len(response.context['page_obj']), second_page)
+
+    def test_single_paginator_on_feed_pages(self):
+        reader = User.objects.create_user(username='pagin_reader')
+        Follow.objects.create(user=reader, author=self.post_author)
+        self.client.force_login(reader)
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.post_author.username]),
+            reverse('posts:follow_index'),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(
+                    response.content.decode().count('class="pagination"'), 1)
+
+
+@override_settings(PAGINATION_MODE={
+    'index': 'cursor',
+    'group_posts': 'cursor',
+    'profile': 'cursor',
+})
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post_author = User.objects.create_user(username='cursor_test')
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            description='Тестовое описание',
+            slug='test-slug'
+        )
+        cls.post_count = 13
+        Post.objects.bulk_create(Post(
+            text=f'Тестовый текст {i}',
+            author=cls.post_author,
+            group=cls.group
+        ) for i in range(cls.post_count))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_walk_all_posts(self):
+        paths = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.post_author.username}),
+        ]
+        for path in paths:
+            with self.subTest(path=path):
+                first = self.client.get(path).context['page_obj']
+                self.assertEqual(len(first), POST_COUNT)
+                self.assertTrue(first.has_next())
+                self.assertFalse(first.has_previous())
+                second = self.client.get(
+                    path, {'after': first.next_cursor}).context['page_obj']
+                self.assertEqual(
+                    len(second), self.post_count - POST_COUNT)
+                self.assertFalse(second.has_next())
+                seen = [post.pk for post in first] + [
+                    post.pk for post in second]
+                self.assertEqual(
+                    seen,
+                    list(Post.objects.order_by(
+                        '-pub_date', '-pk').values_list('pk', flat=True))
+                )
+                back = self.client.get(
+                    path, {'before': second.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(
+                    [post.pk for post in back], [post.pk for post in first])
+                self.assertFalse(back.has_previous())
+
+    def test_broken_cursor_returns_first_page(self):
+        response = self.client.get(reverse('posts:index'), {'after': '%%%'})
+        self.assertEqual(len(response.context['page_obj']), POST_COUNT)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+
+class FollowFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='feed_author')
+        cls.reader = User.objects.create_user(username='feed_reader')
+        cls.old_post = Post.objects.create(text='старый', author=cls.author)
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'feed_author'}))
+        self.assertEqual(self.feed(), [self.old_post])
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'feed_author'}))
+        self.assertEqual(self.feed(), [])
+        self.assertFalse(FeedItem.objects.filter(user=self.reader).exists())
+
+    @override_settings(FEED_BACKFILL_LIMIT=1)
+    def test_follow_backfills_only_recent_posts(self):
+        new_post = Post.objects.create(text='новый', author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            list(FeedItem.objects.filter(user=self.reader).values_list(
+                'post_id', flat=True)), [new_post.pk])
+
+    def test_new_post_is_pushed_to_followers(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(text='новый', author=self.author)
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    def test_rebuild_feeds_command(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        FeedItem.objects.all().delete()
+        call_command('rebuild_feeds', stdout=StringIO())
+        self.assertEqual(self.feed(), [self.old_post])
+
+    @override_settings(FEED_PULL_THRESHOLD=2)
+    def test_popular_author_is_merged_on_read(self):
+        popular = User.objects.create_user(username='popular')
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=fan, author=popular)
+        Follow.objects.create(user=self.reader, author=popular)
+        Follow.objects.create(user=self.reader, author=self.author)
+        pulled = Post.objects.create(text='популярный', author=popular)
+        pushed = Post.objects.create(text='обычный', author=self.author)
+        self.assertFalse(FeedItem.objects.filter(post=pulled).exists())
+        self.assertEqual(self.feed(), [pushed, pulled, self.old_post])
+
+    @override_settings(FEED_PULL_THRESHOLD=3, FEED_PUSH_THRESHOLD=2,
+                       BACKGROUND_WORKERS=0)
+    @mock.patch('posts.background.transaction.on_commit',
+                lambda callback: callback())
+    def test_crossing_threshold_keeps_posts_in_feed(self):
+        rising = User.objects.create_user(username='rising')
+        fans = [User.objects.create_user(username=f'fan_{i}')
+                for i in range(3)]
+        pushed = Post.objects.create(text='до популярности', author=rising)
+        for user in (self.reader, fans[0], fans[1]):
+            Follow.objects.create(user=user, author=rising)
+        pulled = Post.objects.create(text='в популярности', author=rising)
+        Follow.objects.create(user=fans[2], author=rising)
+        self.assertFalse(FeedItem.objects.filter(post=pulled).exists())
+        self.assertEqual(self.feed(), [pulled, pushed])
+        # Между порогами автор остаётся в подмешивании: отписка и
+        # подписка на границе ничего не раскладывают.
+        for _ in range(2):
+            Follow.objects.filter(user=fans[0]).delete()
+            Follow.objects.create(user=fans[0], author=rising)
+        Follow.objects.filter(user__in=fans[:2]).delete()
+        self.assertFalse(FeedItem.objects.filter(post=pulled).exists())
+        self.assertEqual(self.feed(), [pulled, pushed])
+        Follow.objects.filter(user=fans[2]).delete()
+        self.assertEqual(self.feed(), [pulled, pushed])
+        self.assertEqual(
+            set(FeedItem.objects.filter(user=self.reader).values_list(
+                'post_id', flat=True)), {pulled.pk, pushed.pk})
+
+    @override_settings(FEED_PULL_THRESHOLD=1,
+                       PAGINATION_MODE={'follow_index': 'cursor'})
+    def test_merged_feed_with_cursor_pagination(self):
+        popular = User.objects.create_user(username='popular')
+        Follow.objects.create(user=self.reader, author=popular)
+        posts = [Post.objects.create(text=f'пост {i}', author=popular)
+                 for i in range(POST_COUNT + 2)]
+        first = self.reader_client.get(
+            reverse('posts:follow_index')).context['page_obj']
+        second = self.reader_client.get(
+            reverse('posts:follow_index'), {'after': first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(first) + list(second), posts[::-1])
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='card_author')
+        cls.post = Post.objects.create(text='Первая версия', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_card_is_cached_per_revision(self):
+        self.client.get(reverse('posts:index'))
+        self.assertTrue(prefetch_post_cards([self.post]))
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            data={'text': 'Вторая версия'},
+        )
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.revision, self.post.revision + 1)
+        self.assertFalse(prefetch_post_cards([post]))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Вторая версия')
+        self.assertTrue(prefetch_post_cards([post]))
+
+    def test_cached_card_is_served(self):
+        cards = {self.post.pk: '<p>из кэша</p>'}
+        self.assertEqual(post_card(self.post, cards), '<p>из кэша</p>')
@@ -0,0 +1,202 @@
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from PIL import features
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from .models import Post, StoredImage
+
+logger = logging.getLogger(__name__)
+
+# Должно совпадать с тегом {% thumbnail %} в шаблонах постов.
+POST_THUMBNAIL_GEOMETRY = '760x339'
+POST_THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+# Ширины для srcset; пропорции берутся из POST_THUMBNAIL_GEOMETRY.
+POST_THUMBNAIL_WIDTHS = (380, 760, 1140)
+
+BATCH_SIZE = 100
+
+# Сколько не ставить картинку в очередь повторно, пока её обрабатывают.
+QUEUED_TIMEOUT = 5 * 60
+
+_executor = None
+
+
+def get_workers():
+    return getattr(settings, 'THUMBNAIL_WORKERS', 2)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=get_workers(), thread_name_prefix='thumbnails')
+    return _executor
+
+
+def variant_geometry(width):
+    base_width, base_height = map(int, POST_THUMBNAIL_GEOMETRY.split('x'))
+    return f'{width}x{round(width * base_height / base_width)}'
+
+
+def source_image(name):
+    # Ключи sorl зависят от хранилища, поэтому берём хранилище поля,
+    # как и тег {% thumbnail post.image %}.
+    return ImageFile(name, Post._meta.get_field('image').storage)
+
+
+def variant_widths(name):
+    """Ширины для srcset без увеличения картинки сверх её размера.
+
+    Основная ширина из POST_THUMBNAIL_GEOMETRY остаётся всегда. Размер
+    исходника sorl хранит в kvstore, поэтому файл не перечитывается.
+    """
+    base_width = int(POST_THUMBNAIL_GEOMETRY.split('x')[0])
+    get_thumbnail(
+        source_image(name), POST_THUMBNAIL_GEOMETRY, **POST_THUMBNAIL_OPTIONS)
+    source = default.kvstore.get(source_image(name))
+    source_width = source.width if source else base_width
+    return [width for width in POST_THUMBNAIL_WIDTHS
+            if width <= max(base_width, source_width)]
+
+
+def variant_formats():
+    """Формат sorl по умолчанию (JPEG) и WebP, если Pillow его умеет."""
+    if features.check('webp'):
+        return [None, 'WEBP']
+    return [None]
+
+
+def thumbnail_cache_key(name):
+    digest = hashlib.md5(name.encode()).hexdigest()
+    widths = '-'.join(map(str, POST_THUMBNAIL_WIDTHS))
+    return f'post_thumbnails:{POST_THUMBNAIL_GEOMETRY}:{widths}:{digest}'
+
+
+def generate_thumbnails(name):
+    """Создаёт недостающие варианты миниатюры поста через sorl.
+
+    Для каждой ширины из variant_widths() делается JPEG и, если
+    доступен, WebP. Возвращает {'src', 'srcset', 'webp_srcset'} и
+    запоминает его в кэше для get_thumbnail_variants().
+    """
+    srcsets = {}
+    src = None
+    try:
+        for image_format in variant_formats():
+            options = dict(POST_THUMBNAIL_OPTIONS)
+            if image_format:
+                options['format'] = image_format
+            srcset = []
+            for width in variant_widths(name):
+                thumbnail = get_thumbnail(
+                    source_image(name), variant_geometry(width), **options)
+                srcset.append(f'{thumbnail.url} {width}w')
+                if image_format is None and (
+                        variant_geometry(width) == POST_THUMBNAIL_GEOMETRY):
+                    src = thumbnail.url
+            srcsets[image_format] = ', '.join(srcset)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+        return None
+    variants = {
+        'src': src,
+        'srcset': srcsets[None],
+        'webp_srcset': srcsets.get('WEBP', ''),
+    }
+    cache.set(thumbnail_cache_key(name), variants,
+              thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+    return variants
+
+
+def get_thumbnail_variants(names):
+    """Варианты миниатюр для картинок страницы одним get_many.
+
+    Без этого каждый {% thumbnail %} отдельно ходит в kvstore sorl.
+    Имена картинок не меняются после загрузки, поэтому адреса можно
+    кэшировать без инвалидации. Недостающие варианты ставятся в
+    очередь, а страница пока показывает одну миниатюру тегом
+    {% thumbnail %}: ресайзить все варианты во время запроса дорого.
+    """
+    keys = {thumbnail_cache_key(name): name for name in names}
+    cached = cache.get_many(keys)
+    queue = get_workers()
+    for key, name in keys.items():
+        if queue and key not in cached and cache.add(
+                f'{key}:queued', True, QUEUED_TIMEOUT):
+            enqueue_thumbnail(name)
+    return {keys[key]: variants for key, variants in cached.items()}
+
+
+def attach_thumbnails(posts):
+    """Проставляет post.thumbnails постам с картинками."""
+    posts = [post for post in posts if post.image]
+    found = get_thumbnail_variants(post.image.name for post in posts)
+    for post in posts:
+        post.thumbnails = found.get(post.image.name)
+
+
+def generate_in_worker(name):
+    try:
+        return generate_thumbnails(name)
+    finally:
+        # У каждого потока пула своё соединение с БД для kvstore.
+        connection.close()
+
+
+def enqueue_thumbnail(name):
+    """Создаёт миниатюру в фоне, когда пост с картинкой уже сохранён.
+
+    При THUMBNAIL_WORKERS = 0 ничего не делает: миниатюру лениво
+    создаст тег {% thumbnail %} при первом показе, а варианты для
+    srcset — только команда pregenerate_thumbnails.
+    """
+    if not get_workers():
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(generate_in_worker, name))
+
+
+def iter_image_names(batch_size=BATCH_SIZE):
+    """Имена картинок постов без повторов, пачками по индексу StoredImage.
+
+    Каждая пачка читается отдельным запросом до конца: открытый курсор
+    SQLite мешал бы потокам пула записывать kvstore.
+    """
+    last = ''
+    while True:
+        batch = list(StoredImage.objects.filter(
+            name__gt=last, refcount__gt=0).order_by('name').values_list(
+                'name', flat=True)[:batch_size])
+        yield from batch
+        if len(batch) < batch_size:
+            return
+        last = batch[-1]
+
+
+def pregenerate_thumbnails(names, workers=None):
+    """Создаёт недостающие миниатюры; возвращает число обработанных картинок.
+
+    Имена отправляются в пул пачками, чтобы не держать в памяти
+    задачи на все посты сразу. С одним потоком пул не нужен.
+    """
+    workers = workers or get_workers() or os.cpu_count()
+    names = iter(names)
+    count = 0
+    if workers == 1:
+        for name in names:
+            count += generate_thumbnails(name) is not None
+        return count
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch in iter(lambda: list(islice(names, BATCH_SIZE)), []):
+            results = executor.map(generate_in_worker, batch)
+            count += sum(result is not None for result in results)
+    return count
@@ -0,0 +1,123 @@
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import (SimpleUploadedFile,
+                                            TemporaryUploadedFile)
+from django.core.files.uploadhandler import FileUploadHandler
+from PIL import Image
+
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+
+# Столько байт хватает, чтобы Pillow прочитал формат и размеры
+# даже при большом EXIF в начале JPEG.
+HEADER_BYTES = 256 * 1024
+
+
+def get_upload_limits():
+    return (
+        getattr(settings, 'UPLOAD_IMAGE_MAX_BYTES', 10 * 1024 * 1024),
+        getattr(settings, 'UPLOAD_IMAGE_MAX_PIXELS', 24000000),
+        getattr(settings, 'UPLOAD_IMAGE_MAX_SIDE', 2560),
+    )
+
+
+class RejectedUpload(SimpleUploadedFile):
+    """Пустая заглушка вместо отклонённого файла; причина в upload_error."""
+
+    def __init__(self, name, upload_error):
+        super().__init__(name, b'')
+        self.upload_error = upload_error
+
+
+class BoundedImageUploadHandler(FileUploadHandler):
+    """Принимает картинку потоком на диск с ограничениями по ходу загрузки.
+
+    Формат и размеры проверяются по первым байтам, пока остальные ещё
+    идут; лишние байты и слишком большие по пикселям картинки
+    отклоняются до декодирования. Принятая картинка сжимается до
+    UPLOAD_IMAGE_MAX_SIDE по большей стороне. Все загрузки на сайте —
+    картинки постов, поэтому обработчик стоит в FILE_UPLOAD_HANDLERS
+    единственным.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.max_bytes, self.max_pixels, self.max_side = get_upload_limits()
+        self.file = TemporaryUploadedFile(
+            self.file_name, self.content_type, 0, self.charset,
+            self.content_type_extra)
+        self.header = b''
+        self.image_format = None
+        self.received = 0
+        self.upload_error = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.upload_error:
+            return None
+        self.received += len(raw_data)
+        if self.received > self.max_bytes:
+            self.reject(f'Файл больше {self.max_bytes // 1024} КБ')
+            return None
+        if self.image_format is None:
+            self.header += raw_data[:HEADER_BYTES - len(self.header)]
+            self.check_header(complete=False)
+        if not self.upload_error:
+            self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self.image_format is None and not self.upload_error:
+            self.check_header(complete=True)
+        if self.upload_error:
+            return RejectedUpload(self.file_name, self.upload_error)
+        self.file.seek(0)
+        self.file.size = file_size
+        try:
+            return self.shrink(self.file)
+        except (OSError, SyntaxError):
+            # Заголовок цел, но данные битые или обрезаны.
+            self.reject('Файл картинки повреждён')
+            return RejectedUpload(self.file_name, self.upload_error)
+
+    def reject(self, upload_error):
+        self.upload_error = upload_error
+        self.header = b''
+        self.file.close()
+
+    def check_header(self, complete):
+        try:
+            with Image.open(BytesIO(self.header)) as image:
+                image_format, (width, height) = image.format, image.size
+        except Image.DecompressionBombError:
+            self.reject('Слишком большая картинка')
+            return
+        except Exception:
+            if complete or len(self.header) >= HEADER_BYTES:
+                self.reject('Загрузите картинку в формате JPEG, PNG, '
+                            'GIF или WebP')
+            return
+        self.header = b''
+        self.image_format = image_format
+        if image_format not in ALLOWED_FORMATS:
+            self.reject(f'Формат {image_format} не поддерживается')
+        elif width * height > self.max_pixels:
+            self.reject(f'Картинка {width}x{height} слишком большая')
+
+    def shrink(self, upload):
+        """Пересохраняет картинку, если она больше max_side."""
+        size = (self.max_side, self.max_side)
+        with Image.open(upload) as image:
+            if max(image.size) <= self.max_side:
+                upload.seek(0)
+                return upload
+            # JPEG сразу декодируется в уменьшенном масштабе.
+            image.draft('RGB', size)
+            image.thumbnail(size)
+            result = TemporaryUploadedFile(
+                self.file_name, self.content_type, 0, self.charset,
+                self.content_type_extra)
+            image.save(result, self.image_format)
+        upload.close()
+        result.size = result.tell()
+        result.seek(0)
+        return result
@@ -1,77 +1,139 @@
+from urllib.parse import urlencode
+
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import render, get_object_or_404, redirect
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.shortcuts import render, get_object_or_404, redirect
 
+from core.decorators import anonymous_page_cache, query_budget, versioned_cache
 from .forms import PostForm, CommentForm
-from .models import Post, Group, User, Follow
-
-POST_COUNT = 10
+from .cache_versions import (author_validator, get_version, group_validator,
+                             index_validator, post_validator,
+                             profile_validator)
+from .counters import get_user_stats
+from .exporter import RECORD_TYPES, export_records, parse_bound, to_ndjson
+from .feed import FEED_KEYS, get_follow_feed
+from .models import Comment, Follow, Group, Post, User
+from .paginator import COMMENT_COUNT, POST_COUNT, PathPaginator, paginate
+from .search import search_posts
+from .syndication import (AuthorPostsAtomFeed, AuthorPostsFeed,
+                          GroupPostsAtomFeed, GroupPostsFeed,
+                          LatestPostsAtomFeed, LatestPostsFeed)
+from .thumbnails import attach_thumbnails
 
 
+@anonymous_page_cache(index_validator)
+@query_budget(4)
 def index(request):
-    posts = Post.objects.all()
-    paginator = Paginator(posts, POST_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.select_related('author', 'group')
+    page_obj = paginate(request, posts, 'index')
     context = {
         'text': 'Это главная страница проекта Yatube',
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'cache_version': get_version('index'),
     }
     return render(request, 'posts/index.html', context)
 
 
+@anonymous_page_cache(group_validator)
+@query_budget(5)
 def group_posts(request, slug):
     """Здесь будет информация о группах проекта Yatube."""
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, POST_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = group.posts.select_related('author')
+    page_obj = paginate(request, posts, 'group_posts')
     context = {
         'text': 'Здесь будет информация о группах проекта Yatube',
         'group': group,
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'cache_version': get_version(f'group:{group.pk}'),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@anonymous_page_cache(profile_validator)
+@query_budget(7)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    paginator = Paginator(posts, POST_COUNT)
+    posts = author.posts.select_related('group')
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    post_count = author.posts.count()
+    page_obj = paginate(request, posts, 'profile')
+    stats = get_user_stats(author)
     following = (request.user.is_authenticated
                  and author.following.filter(user=request.user).exists())
     context = {
         'author': author,
         'page_obj': page_obj,
         'page_number': page_number,
-        'post_count': post_count,
-        'following': following
+        'post_count': stats.posts_count,
+        'stats': stats,
+        'following': following,
+        'cache_version': get_version(f'profile:{author.pk}'),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@anonymous_page_cache(post_validator)
+@query_budget(5)
 def post_detail(request, post_id):
-    posts = get_object_or_404(Post, pk=post_id)
+    posts = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id)
+    attach_thumbnails([posts])
     author = posts.author
     pub_date = posts.pub_date
-    post_count = author.posts.count()
+    post_count = get_user_stats(author).posts_count
     form = CommentForm(request.POST or None)
-    comments = posts.comments.all()
+    reply_to = request.GET.get('reply_to', '')
+    comments = get_comments_page(request, post_id)
     context = {
         'posts': posts,
+        'post_id': post_id,
         'author': author,
         'pub_date': pub_date,
         'post_count': post_count,
         'form': form,
-        'comments': comments
+        'comments': comments,
+        'thread': request.GET.get('thread', ''),
+        'reply_to': reply_to if reply_to.isdigit() else '',
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def get_comments_page(request, post_id):
+    """Порция комментариев в порядке веток, с авторами одним JOIN.
+
+    ?thread=<id> ограничивает выдачу веткой этого комментария.
+    """
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author').only('pk', 'post_id', 'parent_id', 'text', 'created',
+                       'path', 'replies_count', 'author__username')
+    thread = request.GET.get('thread', '')
+    if thread.isdigit():
+        path = get_object_or_404(
+            Comment.objects.values_list('path', flat=True),
+            pk=thread, post_id=post_id)
+        comments = comments.filter(path__gte=path, path__lt=path + '~')
+    after = request.GET.get('after', '')
+    if not after.isdigit():
+        after = None
+    return PathPaginator(comments, COMMENT_COUNT).get_page(after)
+
+
+@versioned_cache(post_validator)
+@query_budget(3)
+def comments(request, post_id):
+    """HTML порции комментариев для кнопки «Показать ещё» и веток."""
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post_id': post.pk,
+        'comments': get_comments_page(request, post.pk),
+        'thread': request.GET.get('thread', ''),
+    }
+    return render(request, 'includes/comments.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -81,7 +143,8 @@ def post_create(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        with transaction.atomic():
+            post.save()
         return redirect('posts:profile', request.user)
     return render(request, 'posts/post_create.html', {'form': form})
 
@@ -115,32 +178,84 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        parent_id = request.POST.get('parent', '')
+        if parent_id.isdigit():
+            # Ответ возможен только на комментарий этого же поста.
+            comment.parent = post.comments.filter(pk=parent_id).first()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@query_budget(3)
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, POST_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = get_follow_feed(request.user)
+    page_obj = paginate(request, posts, 'follow_index', **FEED_KEYS)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/follow.html', context)
 
 
+@query_budget(3)
+def search(request):
+    """Полнотекстовый поиск по постам, лучшие совпадения первыми."""
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        page_obj = Paginator(search_posts(query), POST_COUNT).get_page(
+            request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        with transaction.atomic():
+            Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    with transaction.atomic():
+        Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username=username)
+
+
+@staff_member_required
+def export(request):
+    """Потоковая выгрузка в NDJSON для import_yatube; только для staff."""
+    types = request.GET.get('types', ','.join(RECORD_TYPES)).split(',')
+    try:
+        if set(types) - set(RECORD_TYPES):
+            raise ValueError('Неизвестный тип записей')
+        since = parse_bound(request.GET.get('since'))
+        until = parse_bound(request.GET.get('until'), end=True)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    chunks = to_ndjson(export_records(
+        types, request.GET.get('author'), request.GET.get('group'),
+        since, until))
+    response = StreamingHttpResponse(
+        chunks, content_type='application/x-ndjson; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="yatube.ndjson"'
+    return response
+
+
+# Ленты одинаковы для всех и отдаются из кэша или ответом 304,
+# пока не изменились посты в их области.
+index_rss = versioned_cache(index_validator)(LatestPostsFeed())
+index_atom = versioned_cache(index_validator)(LatestPostsAtomFeed())
+group_rss = versioned_cache(group_validator)(GroupPostsFeed())
+group_atom = versioned_cache(group_validator)(GroupPostsAtomFeed())
+profile_rss = versioned_cache(author_validator)(AuthorPostsFeed())
+profile_atom = versioned_cache(author_validator)(AuthorPostsAtomFeed())
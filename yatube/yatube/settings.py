@@ -20,6 +20,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -35,6 +36,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -109,8 +111,69 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кэш общий для всех процессов: версии из bump_versions должны
+# сбрасывать фрагменты и страницы сразу во всех воркерах, иначе
+# долгие таймауты кэша показывают устаревшие страницы.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.sqlite.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
     }
 }
+
+# Сессии читаются из кэша: проверке лимитов не нужна БД. Кэш должен
+# быть общим для процессов (проверка core.E001).
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Лимиты частоты запросов по имени URL, см. core.middleware.
+RATE_LIMITS = {
+    'posts:post_create': {'user': '10/m', 'ip': '30/m'},
+    'posts:add_comment': {'user': '20/m', 'ip': '60/m'},
+    'posts:profile_follow': {
+        'user': '30/m', 'ip': '90/m', 'methods': ('GET', 'POST')},
+    'posts:profile_unfollow': {
+        'user': '30/m', 'ip': '90/m', 'methods': ('GET', 'POST')},
+    'users:signup': {'ip': '10/h'},
+    'users:login': {'ip': '20/m'},
+    'users:password_reset': {'ip': '5/h'},
+}
+
+# Общий для процессов кэш счётчиков (проверка core.E002).
+RATE_LIMIT_CACHE = 'default'
+
+PAGINATION_MODE = {
+    'index': 'page',
+    'group_posts': 'page',
+    'profile': 'page',
+    'follow_index': 'page',
+}
+
+FEED_PULL_THRESHOLD = 10000
+
+# Автор возвращается к раскладке постов, только когда подписчиков
+# становится меньше этого порога.
+FEED_PUSH_THRESHOLD = 5000
+
+# Потоков для фоновых задач вроде раскладки ленты после отписки.
+BACKGROUND_WORKERS = 1
+
+# Сколько последних постов автора попадает в ленту при подписке.
+FEED_BACKFILL_LIMIT = 200
+
+QUERY_BUDGET_CHECK = False
+
+ANONYMOUS_PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Потоков для фоновой генерации миниатюр и вариантов srcset; при 0
+# миниатюру лениво создаёт шаблон, а srcset не появляется, пока не
+# запущена pregenerate_thumbnails.
+THUMBNAIL_WORKERS = 2
+
+FILE_UPLOAD_HANDLERS = ['posts.uploads.BoundedImageUploadHandler']
+
+UPLOAD_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+
+UPLOAD_IMAGE_MAX_PIXELS = 24000000
+
+UPLOAD_IMAGE_MAX_SIDE = 2560